@@ -1,6 +1,9 @@
+import os
 import time
+import asyncio
 from enum import Enum
 from pathlib import Path
+from typing import Optional
 from dataclasses import dataclass
 
 from fastapi import FastAPI, Request, HTTPException
@@ -9,14 +12,16 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 
 from UI_utils import ProductionStatusManager
-from generators.image_generator import ImageGenerator, ImageGenerators
+from catalog import ChannelCatalog
+from generators.image_generator import ImageGenerator, ImageGenerators, ImageCache, CACHED_IMAGE_GENERATORS, image_cache_key
 from tools.storyboarder import Storyboarder
 from tools.writer import Writer
 from generators.LLM import LLM, Models
-from generators.TTS import ElevenLabsTTS, Voices
+from generators.TTS import ElevenLabsTTS, TTSCache, Voices
 from tools.video_editor import VideoEditor
-from data_types import SerieData, VideoData, VideoYoutubeDetails, VideoProductionStatus
+from data_types import SerieData, VideoData, VideoSummary, VideoYoutubeDetails, VideoProductionStatus, add_save_listener, flush_pending_saves
 from serie_productor import ShortsSerieGenerator
+from jobs import JobManager, JobStatus
 
 app = FastAPI()
 app.mount("/data", StaticFiles(directory="data"), name="data")
@@ -24,17 +29,56 @@ templates = Jinja2Templates(directory="templates")
 
 CHANNEL_PATH = Path("./data/MITO_TV")
 
+tts_cache = TTSCache(cache_dir=Path("./data/cache/tts"))
+catalog = ChannelCatalog(CHANNEL_PATH, db_path=Path("./data/catalog.sqlite"))
+add_save_listener(catalog.on_save)
+image_cache = ImageCache(cache_dir=Path("./data/cache/images"))
+
+# Seconds a storyboard edit waits before being written, so a burst of field edits becomes one write
+STORYBOARD_SAVE_DELAY = 1.0
+
+IMAGE_GENERATION_CONFIG = {
+    "width": 768,
+    "height": 1344,
+    "guidance_scale": 3.5,
+    "num_inference_steps": 28
+}
+
+job_manager = JobManager(
+    jobs_path=Path("./data/jobs"),
+    resource_limits={
+        "llm": 2,
+        "images": 4,
+        "tts": 2,
+        "video": max(1, (os.cpu_count() or 1) // 8),
+    }
+)
+
+@app.on_event("startup")
+async def restore_jobs():
+    job_manager.restore()
+
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    job_manager.shutdown()
+    flush_pending_saves()
+
 @dataclass
 class Config:
     llm_model: Models = Models.OpenAI.GPT4oMini
     image_generator: ImageGenerator = ImageGenerators.Replicate.FLUX1_SCHNELL
     temperature: float = 0.5
+    serie_max_workers: int = 4
+    tts_max_workers: int = 4
+    video_workers: int = os.cpu_count() or 1
     
     def to_dict(self):
         return {
             "llm_model": str(self.llm_model),
             "image_generator": str(self.image_generator),
             "temperature": self.temperature,
+            "serie_max_workers": self.serie_max_workers,
+            "tts_max_workers": self.tts_max_workers,
             "available_llm_models": [str(model) for model_class in vars(Models).values() 
                                if isinstance(model_class, type) and issubclass(model_class, Enum)
                                for model in model_class.__members__.values()],
@@ -47,7 +91,7 @@ config = Config()
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    series_data = ProductionStatusManager.get_series_data(channel_path=CHANNEL_PATH)
+    series_data = ProductionStatusManager.get_series_data(channel_path=CHANNEL_PATH, catalog=catalog)
     return templates.TemplateResponse("index.html", {
         "request": request,
         "series_data": series_data,
@@ -64,6 +108,8 @@ async def update_config(request: Request):
     config.llm_model = getattr(getattr(Models, provider := config_update["llm_model"].split('.')[0]), config_update["llm_model"].split('.')[1])
     config.image_generator = getattr(getattr(ImageGenerators, provider := config_update["image_generator"].split('.')[0]), config_update["image_generator"].split('.')[1])
     config.temperature = float(config_update["temperature"])
+    config.serie_max_workers = int(config_update.get("serie_max_workers", config.serie_max_workers))
+    config.tts_max_workers = max(1, int(config_update.get("tts_max_workers", config.tts_max_workers)))
     return JSONResponse(content=config.to_dict())
 
 @app.get("/create/serie", response_class=HTMLResponse)
@@ -72,59 +118,119 @@ async def index(request: Request):
         "request": request,
     })
 
-@app.post("/create/serie")
-async def create_serie(request: Request):
-    try:
-        form_data = await request.json()
-        
-        llm = LLM(model=config.llm_model, llm_config={"temperature": config.temperature})
-        
-        serie_dir = CHANNEL_PATH / form_data["name"].lower().replace(" ", "_")
-        serie_data = SerieData(
-            json_data_path=str(serie_dir / "data.json"),
-            serie_path=str(serie_dir),
-            name=form_data["name"],
-            serie_theme=form_data["serie_theme"],
-            used_themes=[],
-            expertise=form_data["expertise"],
-            num_stories=int(form_data["num_stories"]),
-        )
-        
-        generator = ShortsSerieGenerator(llm=llm, serie_data=serie_data)
-        result = generator.generate_serie()
-        
-        return JSONResponse(content={
-            "success": True,
-            "message": "Serie generated successfully",
-            "result": result.model_dump_json(),
-            "serie_path": str(serie_dir)
-        })
-        
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": f"Error generating serie: {str(e)}"
-            }
-        )
+@job_manager.register("create_serie", resource="llm")
+def create_serie_job(form_data: dict, llm_model: str, temperature: float, max_workers: int) -> dict:
+    provider, model_name = llm_model.split('.')
+    llm = LLM(model=getattr(getattr(Models, provider), model_name), llm_config={"temperature": temperature})
+
+    serie_dir = CHANNEL_PATH / form_data["name"].lower().replace(" ", "_")
+    serie_data = SerieData(
+        json_data_path=str(serie_dir / "data.json"),
+        serie_path=str(serie_dir),
+        name=form_data["name"],
+        serie_theme=form_data["serie_theme"],
+        used_themes=[],
+        expertise=form_data["expertise"],
+        num_stories=int(form_data["num_stories"]),
+    )
 
-@app.post("/create/images/{serie_name}/{video_n}")
-async def create_images(request: Request, serie_name: str, video_n: str):
+    generator = ShortsSerieGenerator(llm=llm, serie_data=serie_data)
+    generator.generate_serie(max_workers=max_workers)
+    return {"message": "Serie generated successfully", "serie_path": str(serie_dir)}
+
+@job_manager.register("resume_serie", resource="llm", resumable=True)
+def resume_serie_job(serie_name: str, llm_model: str, temperature: float, max_workers: int) -> dict:
+    provider, model_name = llm_model.split('.')
+    llm = LLM(model=getattr(getattr(Models, provider), model_name), llm_config={"temperature": temperature})
+
+    serie_dir = CHANNEL_PATH / serie_name.lower().replace(" ", "_")
+    ShortsSerieGenerator.resume(llm=llm, json_data_path=serie_dir / "data.json", max_workers=max_workers)
+    return {"message": "Serie resumed successfully", "serie_path": str(serie_dir)}
+
+@job_manager.register("create_images", resource="images")
+def create_images_job(serie_name: str, video_n: str, image_generator: str) -> dict:
     VIDEO_ASSETS_PATH = CHANNEL_PATH / serie_name.lower().replace(" ", "_") / video_n
     video_data_path = VIDEO_ASSETS_PATH / "video_data.json"
     
     video_data = VideoData.get(video_data_path)
 
-    image_generator = ImageGenerator(generator=config.image_generator)
-    image_generator.generate_images(
-        prompts=[scene.image for scene in video_data.storyboard.scenes],
+    provider, generator_name = image_generator.split('.')
+    generator_type = getattr(getattr(ImageGenerators, provider), generator_name)
+    generator = ImageGenerator(generator=generator_type)
+    prompts = [scene.image for scene in video_data.storyboard.scenes]
+    generator.generate_images(
+        prompts=prompts,
         output_dir=VIDEO_ASSETS_PATH / "images",
-        width=768,
-        height=1344,
-        guidance_scale=3.5,
-        num_inference_steps=28
+        **({"cache": image_cache} if generator_type in CACHED_IMAGE_GENERATORS else {}),
+        **IMAGE_GENERATION_CONFIG
+    )
+
+    # Se guarda con qué generador y prompt se hizo cada imagen, para fijar la entrada correcta al aprobarla.
+    # Se relee el vídeo por si se editó el storyboard mientras se generaban
+    video_data = VideoData.get(video_data_path)
+    for scene, prompt in zip(video_data.storyboard.scenes, prompts):
+        scene.image_cache_key = image_cache_key(generator_type, prompt, **IMAGE_GENERATION_CONFIG)
+    video_data.save()
+    return {"message": "✅ Images generated successfully"}
+
+@app.post("/create/serie")
+async def create_serie(request: Request):
+    form_data = await request.json()
+    job = job_manager.submit(
+        "create_serie",
+        form_data=form_data,
+        llm_model=str(config.llm_model),
+        temperature=config.temperature,
+        max_workers=config.serie_max_workers,
     )
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "Serie generation queued",
+        "job_id": job.id,
+    })
+
+@app.post("/resume/serie/{serie_name}")
+async def resume_serie(request: Request, serie_name: str):
+    job = job_manager.submit(
+        "resume_serie",
+        serie_name=serie_name,
+        llm_model=str(config.llm_model),
+        temperature=config.temperature,
+        max_workers=config.serie_max_workers,
+    )
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "Serie resume queued",
+        "job_id": job.id,
+    })
+
+@app.post("/create/images/{serie_name}/{video_n}")
+async def create_images(request: Request, serie_name: str, video_n: str):
+    job = job_manager.submit(
+        "create_images",
+        serie_name=serie_name,
+        video_n=video_n,
+        image_generator=str(config.image_generator),
+    )
+    return JSONResponse(status_code=202, content={
+        "message": "Image generation queued",
+        "job_id": job.id,
+    })
+
+@app.get("/serie/{serie_name}/videos")
+async def list_serie_videos(serie_name: str, page: int = 0, page_size: int = 20):
+    serie_data_path = CHANNEL_PATH / serie_name.lower().replace(" ", "_") / "data.json"
+    if not serie_data_path.exists():
+        raise HTTPException(status_code=404, detail=f"Serie {serie_name} not found")
+
+    # Solo se leen los campos de resumen de los vídeos de la página pedida
+    videos = SerieData.get(serie_data_path).videos
+    return JSONResponse(content={
+        "total": len(videos),
+        "page": page,
+        "page_size": page_size,
+        "videos": [video.model_dump(mode='json', include=set(VideoSummary.model_fields)) for video in videos.page(page, page_size)],
+    })
 
 @app.get("/storyboard/{serie_name}/{video_n}", response_class=HTMLResponse)
 async def show_storyboard(request: Request, serie_name: str, video_n: str):
@@ -167,7 +273,7 @@ async def update_storyboard(
         setattr(video_data.storyboard.scenes[index], field, new_value)
         
         # Save the updated video data
-        video_data.save()
+        video_data.save(delay=STORYBOARD_SAVE_DELAY)
         
         return JSONResponse(content={
             "success": True,
@@ -201,6 +307,15 @@ async def update_image_status(
     
     video_data.production_status.images_completed[index] = value
     video_data.save()
+
+    # Las imágenes aprobadas se fijan en la caché para que nunca se descarten ni se regeneren. La clave es la
+    # guardada al generar la imagen; no la hay para generadores locales ni imágenes anteriores a la caché
+    cache_key = video_data.storyboard.scenes[index].image_cache_key if index < len(video_data.storyboard.scenes) else None
+    if cache_key:
+        if value:
+            image_cache.pin(cache_key, VIDEO_ASSETS_PATH / "images" / f"{index}.png")
+        else:
+            image_cache.unpin(cache_key)
     
     return HTMLResponse(content=f'<p>💾✔️</p>')
 
@@ -216,20 +331,24 @@ async def remake_image(request: Request, serie_name: str, video_n: str, index: i
         
         image_path = images_dir / f"{index}.png"
 
-        # Generate new image using image_generator
-        image_generator = ImageGenerator(generator=config.image_generator)
-        image_generator.generate_images(
-            prompts=[image_prompt],
-            output_dir=image_path,
-            width=768,
-            height=1344,
-            guidance_scale=3.5,
-            num_inference_steps=28
-        )
+        # Generate new image using image_generator, off the event loop. The cache is skipped: the prompt
+        # is usually unchanged and the point is to get a different image, which then replaces the cached one
+        generator_type = config.image_generator
+        def remake() -> Optional[str]:
+            image_generator = ImageGenerator(generator=generator_type)
+            image_generator.generate_images(prompts=[image_prompt], output_dir=image_path, **IMAGE_GENERATION_CONFIG)
+            cache_key = image_cache_key(generator_type, image_prompt, **IMAGE_GENERATION_CONFIG)
+            if cache_key:
+                image_cache.put(cache_key, image_path)
+            return cache_key
+        cache_key = await asyncio.to_thread(remake)
 
         # Update storyboard data
         video_data_path = VIDEO_ASSETS_PATH / "video_data.json"
         video_data = VideoData.get(video_data_path)
+        if index < len(video_data.storyboard.scenes):
+            video_data.storyboard.scenes[index].image_cache_key = cache_key
+            video_data.save()
         
         # Add timestamp to force browser to reload image
         timestamp = int(time.time() * 1000)
@@ -303,51 +422,70 @@ async def generate_text(request: Request, serie_name: str, video_n: str):
     except Exception as e:
         return HTMLResponse(content=f'<p style="color:red;">Error: {str(e)}</p>', status_code=500)
 
-@app.post("/generate_tts/{serie_name}/{video_n}")
-async def generate_tts(request: Request, serie_name: str, video_n: str):
+@job_manager.register("generate_tts", resource="tts")
+def generate_tts_job(serie_name: str, video_n: str) -> dict:
     VIDEO_ASSETS_PATH = CHANNEL_PATH / serie_name.lower().replace(" ", "_") / video_n
     video_data_path = VIDEO_ASSETS_PATH / "video_data.json"
     audios_path = VIDEO_ASSETS_PATH / "audios"
     audios_path.mkdir(parents=True, exist_ok=True)
 
-    try:
-        # Load video data
+    video_data = VideoData.get(video_data_path)
+
+    ElevenLabsTTS.generate_speech_batch(
+        texts=[scene.text for scene in video_data.storyboard.scenes],
+        output_dir=audios_path,
+        max_workers=config.tts_max_workers,
+        cache=tts_cache,
+        voice=Voices.ElevenLabs.DAN_DAN
+    )
+
+    video_data.production_status.tts_completed = True
+    video_data.save()
+
+    return {"message": "✅ TTS generation completed successfully"}
+
+@job_manager.register("generate_video", resource="video")
+def generate_video_job(serie_name: str, video_n: str, preview: bool = False) -> dict:
+    VIDEO_ASSETS_PATH = CHANNEL_PATH / serie_name.lower().replace(" ", "_") / video_n
+    video_name = f"{video_n}_preview.mp4" if preview else f"{video_n}.mp4"
+    output_path = VIDEO_ASSETS_PATH / video_name
+
+    VideoEditor.generate_depth_video(
+        images_path=VIDEO_ASSETS_PATH / "images",
+        audios_path=VIDEO_ASSETS_PATH / "audios",
+        output_path=output_path,
+        background_music_path=Path("C:/Users/bruno/Desktop/autovid/music/mito_tv_loop_01.mp3"),
+        transition_workers=config.video_workers,
+        segmented=True,
+        segment_workers=config.video_workers,
+        preview=preview
+    )
+
+    if not preview:
+        video_data_path = VIDEO_ASSETS_PATH / "video_data.json"
         video_data = VideoData.get(video_data_path)
-        
-        # Generate TTS for each scene
-        for idx, scene in enumerate(video_data.storyboard.scenes):
-            text = scene.text
-            output_file = audios_path / f"{idx}.mp3"
-
-            try:
-                ElevenLabsTTS.generate_speech(
-                    text=text,
-                    output_file=output_file,
-                    voice=Voices.ElevenLabs.DAN_DAN
-                )
-            except Exception as e:
-                return JSONResponse(
-                    status_code=500,
-                    content={"message": f"Error generating TTS for scene {idx}: {str(e)}"}
-                )
-
-        # Update production status
-        video_data.production_status.tts_completed = True
+        video_data.production_status.ready_to_upload = True
         video_data.save()
 
-        return JSONResponse(content={"message": "✅ TTS generation completed successfully"})
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"message": f"Error generating TTS: {str(e)}"}
-        )
+    video_url = f"/data/MITO_TV/{serie_name.lower().replace(' ', '_')}/{video_n}/{video_name}"
+    return {
+        "message": "✅ Preview generated successfully" if preview else "✅ Video generation completed successfully",
+        "video_url": video_url
+    }
+
+@app.post("/generate_tts/{serie_name}/{video_n}")
+async def generate_tts(request: Request, serie_name: str, video_n: str):
+    job = job_manager.submit("generate_tts", serie_name=serie_name, video_n=video_n)
+    return JSONResponse(status_code=202, content={
+        "message": "TTS generation queued",
+        "job_id": job.id
+    })
 
 @app.post("/generate_video/{serie_name}/{video_n}")
-async def generate_video(request: Request, serie_name: str, video_n: str):
+async def generate_video(request: Request, serie_name: str, video_n: str, preview: bool = False):
     VIDEO_ASSETS_PATH = CHANNEL_PATH / serie_name.lower().replace(" ", "_") / video_n
     images_path = VIDEO_ASSETS_PATH / "images"
     audios_path = VIDEO_ASSETS_PATH / "audios"
-    output_path = VIDEO_ASSETS_PATH / f"{video_n}.mp4"
 
     if not images_path.exists() or not audios_path.exists():
         return JSONResponse(
@@ -355,27 +493,26 @@ async def generate_video(request: Request, serie_name: str, video_n: str):
             content={"message": f"Missing images or audios for {serie_name}/{video_n}"}
         )
 
-    try:
-        VideoEditor.generate_depth_video(
-            images_path=images_path,
-            audios_path=audios_path,
-            output_path=output_path,
-            background_music_path=Path("C:/Users/bruno/Desktop/autovid/music/mito_tv_loop_01.mp3")
-        )
-        
-        # Update video data
-        video_data_path = VIDEO_ASSETS_PATH / "video_data.json"
-        video_data = VideoData.get(video_data_path)
-        video_data.production_status.ready_to_upload = True
-        video_data.save()
-        
-        video_url = f"/data/MITO_TV/{serie_name.lower().replace(' ', '_')}/{video_n}/{video_n}.mp4"
-        return JSONResponse(content={
-            "message": "✅ Video generation completed successfully",
-            "video_url": video_url
-        })
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"message": f"Error generating video: {str(e)}"}
-        )
+    job = job_manager.submit("generate_video", serie_name=serie_name, video_n=video_n, preview=preview)
+    return JSONResponse(status_code=202, content={
+        "message": "Preview generation queued" if preview else "Video generation queued",
+        "job_id": job.id
+    })
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[JobStatus] = None):
+    return JSONResponse(content=[job.model_dump(mode='json') for job in job_manager.list(status=status)])
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job.model_dump(mode='json'))
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job.model_dump(mode='json'))
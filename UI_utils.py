@@ -2,7 +2,8 @@ from typing import List, Dict, Optional
 from pathlib import Path
 from dataclasses import dataclass, field
 
-from data_types import SerieData
+from data_types import SerieData, SerieSummary
+from catalog import ChannelCatalog
 
 @dataclass
 class GlobalStatus:
@@ -14,23 +15,17 @@ class ProductionStatusManager:
         pass
 
     @classmethod
-    def get_series_data(cls, channel_path: Path = Path('data/MITO_TV')) -> list[SerieData]:
-        series = []
+    def get_series_data(cls, channel_path: Path = Path('data/MITO_TV'), catalog: Optional[ChannelCatalog] = None) -> list[SerieSummary]:
+        """Series with their video summaries, served from the channel catalog.
+
+        Only the files modified since they were last indexed are parsed again.
+        """
         if not channel_path.exists():
-            return series
-
-        for serie_dir in channel_path.iterdir():
-            if not serie_dir.is_dir():
-                continue
-                
-            serie_data = serie_dir / 'data.json'
-            if not serie_data.exists():
-                continue
-    
-            serie_data = SerieData.get(serie_data)
-            series.append(serie_data)
-            
-        return series
+            return []
+
+        catalog = catalog or ChannelCatalog(channel_path)
+        catalog.refresh()
+        return catalog.get_series()
 
     @staticmethod
     def update_image_status():
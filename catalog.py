@@ -0,0 +1,148 @@
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional, Union
+
+from data_types import SerieData, SerieSummary, VideoData, VideoSummary, VideoYoutubeDetails, VideoProductionStatus
+
+VIDEO_STATUS_FIELDS = ("text_completed", "storyboard_completed", "tts_completed", "ready_to_upload")
+
+class ChannelCatalog:
+    """SQLite index of the series and video summaries of a channel, so listing them is one query.
+
+    Rows are updated from `on_save` (registered as a `data_types` save listener) and `refresh()` re-reads
+    only the `data.json` / `video_data.json` files whose mtime changed since they were indexed, dropping
+    rows for files that no longer exist.
+    """
+    def __init__(self, channel_path: Path, db_path: Optional[Path] = None):
+        self.channel_path = channel_path
+        self.db_path = db_path or channel_path / "catalog.sqlite"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS series (
+                    json_path TEXT PRIMARY KEY,
+                    serie_dir TEXT NOT NULL,
+                    serie_path TEXT,
+                    name TEXT,
+                    serie_theme TEXT,
+                    expertise TEXT,
+                    num_stories INTEGER,
+                    mtime REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS videos (
+                    json_path TEXT PRIMARY KEY,
+                    serie_dir TEXT NOT NULL,
+                    video_n INTEGER,
+                    title TEXT,
+                    text_cost REAL,
+                    {", ".join(f"{status} INTEGER NOT NULL DEFAULT 0" for status in VIDEO_STATUS_FIELDS)},
+                    mtime REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS videos_serie_dir ON videos (serie_dir, video_n);
+            """)
+
+    def on_save(self, data: Union[SerieData, VideoData]) -> None:
+        if data.json_data_path is None or not self._in_channel(data.json_data_path):
+            return
+        try:
+            with self._lock, self._conn:
+                if isinstance(data, SerieData):
+                    self._upsert_serie(data, data.json_data_path)
+                elif isinstance(data, VideoData):
+                    self._upsert_video(data, data.json_data_path)
+        except sqlite3.Error as e:
+            # The catalog is derived data: the next refresh() picks the file up again
+            print(f"Error updating catalog for {data.json_data_path}: {e}")
+
+    def refresh(self) -> None:
+        serie_files, video_files = {}, {}
+        if self.channel_path.exists():
+            for serie_dir in self.channel_path.iterdir():
+                serie_file = serie_dir / "data.json"
+                if not serie_dir.is_dir() or not serie_file.exists():
+                    continue
+                serie_files[self._key(serie_file)] = serie_file
+                for video_dir in serie_dir.iterdir():
+                    video_file = video_dir / "video_data.json"
+                    if video_dir.is_dir() and video_file.exists():
+                        video_files[self._key(video_file)] = video_file
+
+        with self._lock, self._conn:
+            for table, files, load, upsert in [
+                ("series", serie_files, SerieData.model_validate_json, self._upsert_serie),
+                ("videos", video_files, VideoData.model_validate_json, self._upsert_video),
+            ]:
+                indexed = dict(self._conn.execute(f"SELECT json_path, mtime FROM {table}").fetchall())
+                stale = [key for key in indexed if key not in files]
+                self._conn.executemany(f"DELETE FROM {table} WHERE json_path = ?", [(key,) for key in stale])
+                for key, json_file in files.items():
+                    if indexed.get(key) != json_file.stat().st_mtime:
+                        upsert(load(json_file.read_text(encoding='utf-8')), json_file)
+
+    def get_series(self) -> List[SerieSummary]:
+        """Series with video summaries (number, title, cost and status flags), ordered by folder and number.
+
+        They are read-only summaries: `load()` returns the full SerieData or VideoData to edit and save.
+        """
+        with self._lock:
+            series_rows = self._conn.execute(
+                "SELECT serie_dir, serie_path, json_path, name, serie_theme, expertise, num_stories FROM series ORDER BY serie_dir"
+            ).fetchall()
+            video_rows = self._conn.execute(
+                f"SELECT serie_dir, json_path, video_n, title, text_cost, {', '.join(VIDEO_STATUS_FIELDS)} FROM videos ORDER BY serie_dir, video_n"
+            ).fetchall()
+
+        videos = {}
+        for serie_dir, json_path, video_n, title, text_cost, *statuses in video_rows:
+            videos.setdefault(serie_dir, []).append(VideoSummary(
+                json_data_path=Path(json_path),
+                video_n=video_n,
+                text_cost=text_cost,
+                youtube_details=VideoYoutubeDetails(title=title),
+                production_status=VideoProductionStatus(**{
+                    status: bool(value) for status, value in zip(VIDEO_STATUS_FIELDS, statuses)
+                }),
+            ))
+
+        return [
+            SerieSummary(
+                json_data_path=Path(json_path),
+                serie_path=Path(serie_path) if serie_path else None,
+                name=name,
+                serie_theme=serie_theme,
+                expertise=expertise,
+                num_stories=num_stories,
+                videos=videos.get(serie_dir, []),
+            )
+            for serie_dir, serie_path, json_path, name, serie_theme, expertise, num_stories in series_rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _upsert_serie(self, serie: SerieData, json_file: Path) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(json_file), self._key(json_file.parent), str(serie.serie_path) if serie.serie_path else None,
+             serie.name, serie.serie_theme, serie.expertise, serie.num_stories, json_file.stat().st_mtime),
+        )
+
+    def _upsert_video(self, video: VideoData, json_file: Path) -> None:
+        status = video.production_status or VideoProductionStatus()
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, {', '.join('?' for _ in VIDEO_STATUS_FIELDS)}, ?)",
+            (self._key(json_file), self._key(json_file.parent.parent), video.video_n,
+             video.youtube_details.title if video.youtube_details else None, video.text_cost,
+             *[int(bool(getattr(status, field))) for field in VIDEO_STATUS_FIELDS], json_file.stat().st_mtime),
+        )
+
+    def _in_channel(self, path: Path) -> bool:
+        return Path(self._key(path)).is_relative_to(self._key(self.channel_path))
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
@@ -1,11 +1,118 @@
+import atexit
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Optional, Literal, Union
+from threading import Lock, Timer
+from collections.abc import Sequence
+from typing import Callable, List, Dict, Optional, Literal, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+# Called with every VideoData / SerieData after it is written (e.g. to keep the channel catalog in sync)
+_save_listeners: List[Callable[[BaseModel], None]] = []
+
+def add_save_listener(listener: Callable[[BaseModel], None]) -> None:
+    _save_listeners.append(listener)
+
+def _notify_saved(data: BaseModel) -> None:
+    for listener in _save_listeners:
+        listener(data)
+
+def _atomic_write(path: Path, text: str) -> None:
+    # Se escribe a un temporal y se renombra, así un lector nunca ve un JSON a medio escribir
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    tmp_path.replace(path)
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class _SaveCoalescer:
+    """Keeps the latest JSON of each path saved with a delay and writes it once the burst of saves settles.
+
+    Every `schedule` for a path replaces its pending text and restarts its timer, so N quick edits cost one
+    write. `flush()` writes whatever is still pending; it runs at exit and from `flush_pending_saves()`.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._pending: Dict[Path, tuple[str, Callable[[], None]]] = {}
+        self._timers: Dict[Path, Timer] = {}
+
+    def schedule(self, path: Path, text: str, delay: float, on_written: Callable[[], None]) -> None:
+        path = path.resolve()
+        with self._lock:
+            self._cancel_timer(path)
+            self._pending[path] = (text, on_written)
+            timer = Timer(delay, self.flush, args=(path,))
+            timer.daemon = True
+            self._timers[path] = timer
+            timer.start()
+
+    def pending(self, path: Path) -> Optional[str]:
+        with self._lock:
+            text, _ = self._pending.get(path.resolve(), (None, None))
+            return text
+
+    def write(self, path: Path, text: str) -> None:
+        # Un guardado inmediato sustituye al pendiente; bajo el lock para no pisar el .tmp de un flush
+        path = path.resolve()
+        with self._lock:
+            self._cancel_timer(path)
+            self._pending.pop(path, None)
+            _atomic_write(path, text)
+
+    def flush(self, path: Optional[Path] = None) -> None:
+        written = []
+        with self._lock:
+            for pending_path in [path.resolve()] if path is not None else list(self._pending):
+                self._cancel_timer(pending_path)
+                if pending_path in self._pending:
+                    text, on_written = self._pending.pop(pending_path)
+                    _atomic_write(pending_path, text)
+                    written.append(on_written)
+        # Los listeners (p. ej. el catálogo) se avisan fuera del lock
+        for on_written in written:
+            on_written()
+
+    def _cancel_timer(self, path: Path) -> None:
+        timer = self._timers.pop(path, None)
+        if timer is not None:
+            timer.cancel()
+
+_coalescer = _SaveCoalescer()
+atexit.register(_coalescer.flush)
+
+def flush_pending_saves() -> None:
+    """Write every VideoData / SerieData saved with a `delay` that is still waiting for its timer."""
+    _coalescer.flush()
+
+def _read_json(path: Path) -> str:
+    # Un guardado diferido todavía pendiente es más reciente que el fichero
+    pending = _coalescer.pending(path)
+    return pending if pending is not None else path.read_text(encoding='utf-8')
+
+def _save_json(data: BaseModel, path: Path, text: str, saved_digest: Optional[str], delay: float) -> Optional[str]:
+    """Write `text` to `path` (atomically, or coalesced after `delay` seconds) and notify the save listeners.
+
+    Returns the digest of what was saved, or None when `text` matches `saved_digest` (the last JSON loaded
+    or saved by this object) and the file already holds it, in which case nothing is written.
+    """
+    digest = _digest(text)
+    if digest == saved_digest and (path.exists() or _coalescer.pending(path) is not None):
+        return None
+
+    if delay > 0:
+        _coalescer.schedule(path, text, delay, lambda: _notify_saved(data))
+    else:
+        _coalescer.write(path, text)
+        _notify_saved(data)
+    return digest
 
 class Scene(BaseModel):
     text:  Optional[str] = None
     image:  Optional[str] = None
+    # Clave en ImageCache de la imagen generada (generador y prompt con que se hizo); None si no se cachea
+    image_cache_key: Optional[str] = None
 
 class Storyboard(BaseModel):
     scenes: List[Scene] = Field(default_factory=list)
@@ -32,6 +139,25 @@ class Storyboard(BaseModel):
                 storyboard.scenes[i].image = update_scene.image
         storyboard.save(filename)
 
+class StoryCheckpoint(BaseModel):
+    theme: Optional[str] = None
+    draft: Optional[str] = None
+    improved_text: Optional[str] = None
+    text_evaluation: Optional[Dict[str, Union[None, float]]] = None
+    storyboard: Optional[Storyboard] = None
+    text_cost: float = 0
+
+    @classmethod
+    def load(cls, filename: Path) -> 'StoryCheckpoint':
+        if not filename.exists():
+            return cls()
+
+        json_data = filename.read_text(encoding='utf-8')
+        return cls.model_validate_json(json_data)
+
+    def save(self, filename: Path) -> None:
+        _atomic_write(filename, self.model_dump_json(indent=2))
+
 class VideoProductionStatus(BaseModel):
     text_completed: bool = False
     text_evaluation: Optional[Dict[str, Union[None, float]]] = None
@@ -62,29 +188,132 @@ class VideoData(BaseModel):
     youtube_details: Optional[VideoYoutubeDetails] = Field(default_factory=VideoYoutubeDetails)
     production_status: Optional[VideoProductionStatus] = Field(default_factory=VideoProductionStatus)
     text_cost: Optional[float] = None
+    # Huella del último JSON leído o guardado, para no reescribir el fichero si nada ha cambiado
+    _saved_digest: Optional[str] = PrivateAttr(default=None)
 
     @classmethod
     def get(cls, json_data_path: Path) -> 'VideoData':
-        if not json_data_path.exists():
+        if not json_data_path.exists() and _coalescer.pending(json_data_path) is None:
             return cls(json_data_path=json_data_path)
         
-        json_data = json_data_path.read_text(encoding='utf-8')
-        return cls.model_validate_json(json_data)
+        json_data = _read_json(json_data_path)
+        video_data = cls.model_validate_json(json_data)
+        video_data._saved_digest = _digest(json_data)
+        return video_data
 
-    def save(self, json_data_path: Optional[Path] = None) -> None:
+    def save(self, json_data_path: Optional[Path] = None, delay: float = 0) -> None:
+        """Write the JSON only if it changed; with `delay` > 0 saves within that many seconds are coalesced."""
         save_path = json_data_path or self.json_data_path
         if not save_path:
             raise ValueError("No save path provided")
             
         self.json_data_path = save_path
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path.write_text(self.model_dump_json(indent=4), encoding='utf-8')
+        digest = _save_json(self, save_path, self.model_dump_json(indent=4), self._saved_digest, delay)
+        self._saved_digest = digest or self._saved_digest
 
     def sync(self) -> None:
         # Implementar lógica de sincronización si es necesaria
         pass
 
+class VideoSummary(BaseModel):
+    """The VideoData fields needed to list a video; its text and storyboard are skipped when parsing."""
+    json_data_path: Optional[Path] = None
+    video_n: Optional[int] = None
+    youtube_details: Optional[VideoYoutubeDetails] = Field(default_factory=VideoYoutubeDetails)
+    production_status: Optional[VideoProductionStatus] = Field(default_factory=VideoProductionStatus)
+    text_cost: Optional[float] = None
+
+    @classmethod
+    def get(cls, json_data_path: Path) -> 'VideoSummary':
+        summary = cls.model_validate_json(_read_json(json_data_path))
+        summary.json_data_path = summary.json_data_path or json_data_path
+        return summary
+
+    def load(self) -> VideoData:
+        return VideoData.get(self.json_data_path)
+
+class VideoCollection(Sequence):
+    """Videos of a serie, read from their `video_data.json` files only when they are used.
+
+    Indexing, slicing and iteration return full VideoData, parsed the first time each one is accessed;
+    `summaries()` and `page()` only validate the summary fields. Videos are ordered by folder number.
+    """
+    def __init__(self, json_paths: List[Path]):
+        self.json_paths = list(json_paths)
+        self._videos: Dict[int, VideoData] = {}
+        self._summaries: Dict[int, VideoSummary] = {}
+
+    @classmethod
+    def from_serie_path(cls, serie_path: Optional[Path]) -> 'VideoCollection':
+        if serie_path is None or not serie_path.exists():
+            return cls([])
+        json_paths = [
+            video_dir / "video_data.json" for video_dir in serie_path.iterdir()
+            if video_dir.is_dir() and (video_dir / "video_data.json").exists()
+        ]
+        return cls(sorted(json_paths, key=lambda path: (0, int(path.parent.name)) if path.parent.name.isdigit() else (1, path.parent.name)))
+
+    def __len__(self) -> int:
+        return len(self.json_paths)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[VideoData, List[VideoData]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = self._normalize(index)
+        if index not in self._videos:
+            self._videos[index] = VideoData.get(self.json_paths[index])
+            self._summaries.pop(index, None)
+        return self._videos[index]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def summary(self, index: int) -> Union[VideoSummary, VideoData]:
+        """Summary of a video, or the full VideoData if it is already loaded (it has the same fields)."""
+        index = self._normalize(index)
+        if index in self._videos:
+            return self._videos[index]
+        if index not in self._summaries:
+            self._summaries[index] = VideoSummary.get(self.json_paths[index])
+        return self._summaries[index]
+
+    def summaries(self, start: int = 0, stop: Optional[int] = None) -> List[Union[VideoSummary, VideoData]]:
+        return [self.summary(i) for i in range(*slice(start, stop).indices(len(self)))]
+
+    def page(self, page: int, page_size: int = 20) -> List[Union[VideoSummary, VideoData]]:
+        """Summaries of the videos in a page (0-based)."""
+        return self.summaries(page * page_size, (page + 1) * page_size)
+
+    def loaded(self) -> List[VideoData]:
+        """Videos already parsed as full VideoData, in order."""
+        return [self._videos[index] for index in sorted(self._videos)]
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("video index out of range")
+        return index
+
+class SerieSummary(BaseModel):
+    """The SerieData fields needed to list a serie, with its video summaries; it has no `save()`."""
+    json_data_path: Optional[Path] = None
+    serie_path: Optional[Path] = None
+    name: Optional[str] = None
+    serie_theme: Optional[str] = None
+    expertise: Optional[str] = None
+    num_stories: Optional[int] = None
+    videos: List[VideoSummary] = Field(default_factory=list)
+
+    def load(self) -> 'SerieData':
+        return SerieData.get(self.json_data_path)
+
 class SerieData(BaseModel):
+    # `videos` es una propiedad sobre `video_list`; el JSON y el constructor siguen usando el nombre `videos`
+    model_config = ConfigDict(populate_by_name=True)
+
     json_data_path: Optional[Path] = None
     serie_path: Optional[Path] = None
     name: Optional[str] = None
@@ -92,43 +321,55 @@ class SerieData(BaseModel):
     used_themes: List[str] = Field(default_factory=list)
     expertise: Optional[str] = None
     num_stories: Optional[int] = None
-    videos: List[VideoData] = Field(default_factory=list)
+    video_list: List[VideoData] = Field(default_factory=list, alias="videos")
+    _saved_digest: Optional[str] = PrivateAttr(default=None)
+    # Vídeos guardados en serie_path, que SerieData.get no parsea hasta que se usan
+    _stored_videos: Optional[VideoCollection] = PrivateAttr(default=None)
 
     @classmethod 
     def get(cls, json_data_path: Path) -> 'SerieData':
-        if not json_data_path.exists():
+        if not json_data_path.exists() and _coalescer.pending(json_data_path) is None:
             return cls(json_data_path=json_data_path)
         
-        json_data = json_data_path.read_text(encoding='utf-8')
+        json_data = _read_json(json_data_path)
         serie_data = cls.model_validate_json(json_data)
+        serie_data._saved_digest = _digest(json_data)
         
-        if not serie_data.videos:
-            videos = []
-            for video_dir in serie_data.serie_path.iterdir():
-                if video_dir.is_dir():
-                    video_json_path = video_dir / "video_data.json"
-                    if video_json_path.exists():
-                        videos.append(VideoData.get(video_json_path))
-            serie_data.videos = sorted(videos, key=lambda video: video.video_n)
+        if not serie_data.video_list:
+            serie_data._stored_videos = VideoCollection.from_serie_path(serie_data.serie_path)
             
         return serie_data
 
-    def save(self, json_data_path: Optional[Path] = None) -> None:
+    @property
+    def videos(self) -> Union[List[VideoData], VideoCollection]:
+        """The videos the serie was built with or, for a serie read with `get`, a VideoCollection of the ones
+        stored under `serie_path`, parsed as they are accessed (with `summaries()` and `page()` for listings)."""
+        if self.video_list or self._stored_videos is None:
+            return self.video_list
+        return self._stored_videos
+
+    @videos.setter
+    def videos(self, videos: List[VideoData]) -> None:
+        self.video_list = list(videos)
+        self._stored_videos = None
+
+    def save(self, json_data_path: Optional[Path] = None, delay: float = 0) -> None:
+        """Save the loaded videos and the serie JSON, each only if it changed (see `VideoData.save`)."""
         save_path = json_data_path or self.json_data_path
         if not save_path:
             raise ValueError("No metadata path provided")
             
         self.json_data_path = save_path
-        save_path.parent.mkdir(parents=True, exist_ok=True)
         
-        for video in self.videos:
-            video.save()
+        # De los vídeos guardados solo se reescriben los que se han cargado
+        videos = self.videos.loaded() if isinstance(self.videos, VideoCollection) else self.videos
+        for video in videos:
+            video.save(delay=delay)
             
         serie_data = self.model_copy()
         serie_data.videos = []
-        
-        save_path.write_text(serie_data.model_dump_json(indent=4), encoding='utf-8')
-
+        digest = _save_json(self, save_path, serie_data.model_dump_json(indent=4, by_alias=True), self._saved_digest, delay)
+        self._saved_digest = digest or self._saved_digest
 
 if __name__ == "__main__":
     # 1. Create a test metadata path
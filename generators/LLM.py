@@ -1,13 +1,22 @@
 import os
+import json
+import time
+import asyncio
+import hashlib
+import weakref
+from pathlib import Path
 from enum import Enum
+from threading import Lock
 from dotenv import load_dotenv
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 
 import cohere
-from anthropic import Anthropic
-from openai import OpenAI
+from anthropic import Anthropic, AsyncAnthropic
+from openai import OpenAI, AsyncOpenAI
+
+from generators.disk_cache import DiskLRU
 
 load_dotenv()
 
@@ -52,6 +61,8 @@ class LLMResponse:
     text: str 
     usage: int
     cost: float
+    cached: bool = False
+    original_cost: Optional[float] = None
 
     def extract_tag(self, tag: str) -> str:
         start_tag = f"<{tag}>"
@@ -60,8 +71,108 @@ class LLMResponse:
         end = self.text.find(end_tag)
         return self.text[start:end].strip()
 
+class ClientPool:
+    """Process-wide SDK clients keyed by provider and API key, so connections are reused across LLM instances.
+
+    Async clients are also keyed by event loop, since their connection pools are bound to the loop that opened them.
+    """
+    _clients: Dict[tuple, Any] = {}
+    _async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, Any]]' = weakref.WeakKeyDictionary()
+    _lock = Lock()
+
+    @classmethod
+    def get(cls, provider: str, api_key: Optional[str], factory: Callable[[], Any]) -> Any:
+        key = (provider, api_key)
+        with cls._lock:
+            if key not in cls._clients:
+                cls._clients[key] = factory()
+            return cls._clients[key]
+
+    @classmethod
+    def get_async(cls, provider: str, api_key: Optional[str], factory: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        key = (provider, api_key)
+        with cls._lock:
+            clients = cls._async_clients.setdefault(loop, {})
+            if key not in clients:
+                clients[key] = factory()
+            return clients[key]
+
+class LLMCache:
+    """Opt-in on-disk response cache, one JSON file per (model, llm_config, system prompt, prompt, prefill).
+
+    Entries expire after `ttl` seconds and the least recently used ones are evicted once the
+    directory grows past `max_bytes` (see `DiskLRU`). Hits are returned with `cost=0` and the cost of the
+    original call in `original_cost`, so callers only account for what they actually paid.
+    """
+    def __init__(self, cache_dir: Path = Path('cache/llm'), ttl: Optional[float] = 7 * 24 * 3600, max_bytes: int = 100 * 1024**2):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_cost = 0.0
+        self._lock = Lock()
+        self._lru = DiskLRU(self.cache_dir, '.json', max_bytes)
+
+    @staticmethod
+    def make_key(model_name: str, llm_config: dict, system_prompt: Optional[str], prompt: str, prefill: Optional[str]) -> str:
+        payload = json.dumps({
+            'model': model_name,
+            'llm_config': llm_config,
+            'system_prompt': system_prompt,
+            'prompt': prompt,
+            'prefill': prefill,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[LLMResponse]:
+        with self._lock:
+            path = self._lru.get(key)
+            try:
+                entry = json.loads(path.read_text(encoding='utf-8')) if path else None
+            except (FileNotFoundError, json.JSONDecodeError):
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and time.time() - entry['created_at'] > self.ttl:
+                self._lru.remove(key)
+                self.misses += 1
+                return None
+
+            self._lru.touch(key)
+            self.hits += 1
+            self.saved_cost += entry['cost']
+
+        return LLMResponse(
+            text=entry['text'],
+            usage=entry['usage'],
+            cost=0.0,
+            cached=True,
+            original_cost=entry['cost']
+        )
+
+    def put(self, key: str, response: LLMResponse) -> None:
+        entry = {
+            'text': response.text,
+            'usage': response.usage,
+            'cost': response.cost,
+            'created_at': time.time(),
+        }
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self._lru.put(key, data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses, 'saved_cost': self.saved_cost}
+
 class LLM(ABC):
-    def __new__(cls, model: Models, llm_config: dict = None):
+    def __new__(cls, model: Models, llm_config: dict = None, cache: Optional[LLMCache] = None, force_cache: bool = False):
         if cls is LLM:
             if isinstance(model, Models.Anthropic):
                 return super().__new__(AnthropicHandler)
@@ -73,39 +184,106 @@ class LLM(ABC):
                 raise ValueError(f"Unsupported model: {model}")
         return super().__new__(cls)
 
-    def __init__(self, model: Models, llm_config: dict = None):
+    def __init__(self, model: Models, llm_config: dict = None, cache: Optional[LLMCache] = None, force_cache: bool = False):
         self.model = model
-        self.llm_config = llm_config
+        self.llm_config = {**model.value.get('llm_config', {}), **(llm_config or {})}
+        self.cache = cache
+        self.force_cache = force_cache
 
-    @abstractmethod
     def generate_text(
         self, 
         prompt: str, 
         system_prompt: Optional[str] = None,
         prefill: Optional[str] = None
+    ) -> Optional[LLMResponse]:
+        cache_key = self._cache_key(prompt, system_prompt, prefill)
+        if cache_key and (cached := self.cache.get(cache_key)):
+            return cached
+
+        response = self._generate_text(prompt, system_prompt, prefill)
+        if cache_key and response:
+            self.cache.put(cache_key, response)
+        return response
+
+    async def agenerate_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        prefill: Optional[str] = None
+    ) -> Optional[LLMResponse]:
+        cache_key = self._cache_key(prompt, system_prompt, prefill)
+        if cache_key and (cached := self.cache.get(cache_key)):
+            return cached
+
+        response = await self._agenerate_text(prompt, system_prompt, prefill)
+        if cache_key and response:
+            self.cache.put(cache_key, response)
+        return response
+
+    def _cache_key(self, prompt: str, system_prompt: Optional[str], prefill: Optional[str]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        # Con temperatura > 0 la respuesta no es reproducible, así que no se cachea salvo que se fuerce
+        if (self.llm_config or {}).get('temperature', 0) > 0 and not self.force_cache:
+            return None
+        return LLMCache.make_key(self.model.value['name'], self.llm_config, system_prompt, prompt, prefill)
+
+    @abstractmethod
+    def _generate_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        prefill: Optional[str] = None
+    ) -> Optional[LLMResponse]:
+        pass
+
+    @abstractmethod
+    async def _agenerate_text(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        prefill: Optional[str] = None
     ) -> Optional[LLMResponse]:
         pass
 
 class AnthropicHandler(LLM):
-    def __init__(self, model: Models.Anthropic, llm_config: dict = None):
-        self.model = model
-        self.llm_config = {**model.value.get('llm_config', {}), **(llm_config or {})}
-        self.client = Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
+    def __init__(self, model: Models.Anthropic, llm_config: dict = None, cache: Optional[LLMCache] = None, force_cache: bool = False):
+        super().__init__(model, llm_config, cache, force_cache)
+        self.api_key = os.environ.get('ANTHROPIC_API_KEY')
+        self.client = ClientPool.get('anthropic', self.api_key, lambda: Anthropic(api_key=self.api_key))
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        return ClientPool.get_async('anthropic', self.api_key, lambda: AsyncAnthropic(api_key=self.api_key))
 
-    def generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+    def _generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
         try:
             message = self._create_message(prompt, system_prompt, prefill)
-            return LLMResponse(
-                text=(prefill or '') + message.content[0].text,
-                usage=message.usage.input_tokens + message.usage.output_tokens,
-                cost=self._calculate_cost(message)
-            )
+            return self._to_response(message, prefill)
         except Exception as e:
             print(f'An error occurred: {e}')
             return None
 
+    async def _agenerate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+        try:
+            message = await self.async_client.messages.create(**self._build_params(prompt, system_prompt, prefill))
+            return self._to_response(message, prefill)
+        except Exception as e:
+            print(f'An error occurred: {e}')
+            return None
+
+    def _to_response(self, message: Any, prefill: Optional[str] = None) -> LLMResponse:
+        return LLMResponse(
+            text=(prefill or '') + message.content[0].text,
+            usage=message.usage.input_tokens + message.usage.output_tokens,
+            cost=self._calculate_cost(message)
+        )
+
     def _create_message(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Any:
-        params = {
+        return self.client.messages.create(**self._build_params(prompt, system_prompt, prefill))
+
+    def _build_params(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> dict:
+        return {
             "model": self.model.value['name'],
             "messages": [
                 {"role": "user", "content": prompt},
@@ -113,7 +291,6 @@ class AnthropicHandler(LLM):
             **({'system': system_prompt} if system_prompt else {}),
             **self.llm_config
         }
-        return self.client.messages.create(**params)
 
     def _calculate_cost(self, message: Any) -> tuple[int, float]:
         model_costs = getattr(Models.Anthropic, self.model.name).value
@@ -122,25 +299,43 @@ class AnthropicHandler(LLM):
         return cost_input + cost_output
     
 class OpenAIHandler(LLM):
-    def __init__(self, model: Models.OpenAI, llm_config: dict = None):
-        self.model = model
-        self.llm_config = {**model.value.get('llm_config', {}), **(llm_config or {})}
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    def __init__(self, model: Models.OpenAI, llm_config: dict = None, cache: Optional[LLMCache] = None, force_cache: bool = False):
+        super().__init__(model, llm_config, cache, force_cache)
+        self.api_key = os.environ.get("OPENAI_API_KEY")
+        self.client = ClientPool.get('openai', self.api_key, lambda: OpenAI(api_key=self.api_key))
 
-    def generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return ClientPool.get_async('openai', self.api_key, lambda: AsyncOpenAI(api_key=self.api_key))
+
+    def _generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
         try:
             message = self._create_message(prompt, system_prompt, prefill)
-            return LLMResponse(
-                text=message.choices[0].message.content,
-                usage=message.usage.prompt_tokens + message.usage.completion_tokens,
-                cost=self._calculate_cost(message)
-            )
+            return self._to_response(message)
         except Exception as e:
             print(f"An error occurred: {e}")
             return None
 
+    async def _agenerate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+        try:
+            message = await self.async_client.chat.completions.create(**self._build_params(prompt, system_prompt, prefill))
+            return self._to_response(message)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def _to_response(self, message: Any) -> LLMResponse:
+        return LLMResponse(
+            text=message.choices[0].message.content,
+            usage=message.usage.prompt_tokens + message.usage.completion_tokens,
+            cost=self._calculate_cost(message)
+        )
+
     def _create_message(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Any:
-        params = {
+        return self.client.chat.completions.create(**self._build_params(prompt, system_prompt, prefill))
+
+    def _build_params(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> dict:
+        return {
             "model": self.model.value['name'],
             "messages": (
                 ([{"role": "system", "content": system_prompt}] if system_prompt else []) +
@@ -149,7 +344,6 @@ class OpenAIHandler(LLM):
             ),
             **self.llm_config
         }
-        return self.client.chat.completions.create(**params)
 
     def _calculate_cost(self, message: Any) -> tuple[int, float]:
         model_costs = getattr(Models.OpenAI, self.model.name).value
@@ -158,25 +352,43 @@ class OpenAIHandler(LLM):
         return input_cost + output_cost
 
 class CohereHandler(LLM):
-    def __init__(self, model: Models.Cohere, llm_config: dict = None):
-        self.model = model
-        self.llm_config = {**model.value.get('llm_config', {}), **(llm_config or {})}
-        self.client = cohere.ClientV2(api_key=os.environ.get("COHERE_API_KEY"))
+    def __init__(self, model: Models.Cohere, llm_config: dict = None, cache: Optional[LLMCache] = None, force_cache: bool = False):
+        super().__init__(model, llm_config, cache, force_cache)
+        self.api_key = os.environ.get("COHERE_API_KEY")
+        self.client = ClientPool.get('cohere', self.api_key, lambda: cohere.ClientV2(api_key=self.api_key))
+
+    @property
+    def async_client(self) -> cohere.AsyncClientV2:
+        return ClientPool.get_async('cohere', self.api_key, lambda: cohere.AsyncClientV2(api_key=self.api_key))
 
-    def generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+    def _generate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
         try:
             message = self._create_message(prompt, system_prompt, prefill)
-            return LLMResponse(
-                text=message.message.content[0].text,
-                usage=message.usage.tokens.input_tokens + message.usage.tokens.output_tokens,
-                cost=self._calculate_cost(message)
-            )
+            return self._to_response(message)
         except Exception as e:
             print(f"An error occurred: {e}")
             return None
 
+    async def _agenerate_text(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Optional[LLMResponse]:
+        try:
+            message = await self.async_client.chat(**self._build_params(prompt, system_prompt, prefill))
+            return self._to_response(message)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def _to_response(self, message: Any) -> LLMResponse:
+        return LLMResponse(
+            text=message.message.content[0].text,
+            usage=message.usage.tokens.input_tokens + message.usage.tokens.output_tokens,
+            cost=self._calculate_cost(message)
+        )
+
     def _create_message(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> Any:
-        params = {
+        return self.client.chat(**self._build_params(prompt, system_prompt, prefill))
+
+    def _build_params(self, prompt: str, system_prompt: Optional[str] = None, prefill: Optional[str] = None) -> dict:
+        return {
             "model": self.model.value['name'],
             "messages": (
                 ([{"role": "system", "content": system_prompt}] if system_prompt else []) +
@@ -185,7 +397,6 @@ class CohereHandler(LLM):
             ),
             **self.llm_config
         }
-        return self.client.chat(**params)
 
     def _calculate_cost(self, message: Any) -> tuple[int, float]:
         model_costs = getattr(Models.Cohere, self.model.name).value
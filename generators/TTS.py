@@ -1,18 +1,46 @@
 import os
+import json
+import time
+import shutil
 import asyncio
+import hashlib
+import inspect
 import requests
+import unicodedata
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from threading import Lock
+from typing import Any, List, Optional
 from dotenv import load_dotenv
 from abc import ABC, abstractmethod
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 import edge_tts
 from gtts import gTTS
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError
+
+from generators.disk_cache import DiskLRU
 
 load_dotenv()
 
+# Sesión HTTP compartida para reutilizar conexiones entre escenas
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits (429), server errors (5xx) and connection failures; other errors (auth, bad voice, quota) are final."""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        # gTTSError guarda la respuesta en `rsp`; ojo, una Response con error es falsa, no vale `or`
+        response = getattr(error, 'response', None)
+        if response is None:
+            response = getattr(error, 'rsp', None)
+        status_code = getattr(response, 'status_code', None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, APIConnectionError, ConnectionError, TimeoutError))
+
 class TTSModels(Enum):
     GOOGLE = 'google'
     AZURE = 'azure'
@@ -54,7 +82,58 @@ class Voices:
         Martin_Osborne_6 = "LlZr3QuzbW4WrPjgATHG"
         DAN_DAN = "9F4C8ztpNUmXkdDDbz3J"
 
+class TTSCache:
+    """On-disk audio cache keyed by (provider, model, voice, voice settings, normalized text).
+
+    Hits are materialized into the output path as a hardlink (or a copy when linking is not
+    possible) and the least recently used entries are evicted once `max_bytes` is exceeded (see `DiskLRU`).
+    """
+    def __init__(self, cache_dir: Path = Path('cache/tts'), max_bytes: int = 500 * 1024**2):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._lru = DiskLRU(self.cache_dir, '.mp3', max_bytes)
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return ' '.join(unicodedata.normalize('NFC', text).split())
+
+    @classmethod
+    def make_key(cls, provider: str, model: Any, voice: Any, voice_settings: Optional[dict], text: str) -> str:
+        payload = json.dumps({
+            'provider': provider,
+            'model': getattr(model, 'value', model),
+            'voice': getattr(voice, 'value', voice),
+            'voice_settings': voice_settings,
+            'text': cls.normalize_text(text),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def materialize(self, key: str, output_file: Path) -> bool:
+        with self._lock:
+            cache_file = self._lru.get(key)
+            if cache_file is None:
+                self.misses += 1
+                return False
+
+            self._lru.touch(key)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            output_file.unlink(missing_ok=True)
+            try:
+                os.link(cache_file, output_file)
+            except OSError:
+                shutil.copy2(cache_file, output_file)
+            self.hits += 1
+            return True
+
+    def put(self, key: str, audio_file: Path) -> None:
+        with self._lock:
+            self._lru.put(key, audio_file)
+
 class TTS(ABC):
+    VOICE_SETTINGS: Optional[dict] = None
+
     @staticmethod
     @abstractmethod
     def generate_speech(
@@ -65,6 +144,61 @@ class TTS(ABC):
     ) -> Path:
         pass
 
+    @classmethod
+    def generate_speech_batch(
+        cls,
+        texts: List[str],
+        output_dir: Path,
+        max_workers: int = 4,
+        retries: int = 3,
+        backoff: float = 1.0,
+        cache: Optional[TTSCache] = None,
+        **kwargs
+    ) -> List[Path]:
+        """Synthesizes every text concurrently into `output_dir/{index}.mp3`.
+
+        Rate-limited, 5xx and connection errors are retried with exponential backoff; any other error fails at once.
+
+        With a `cache`, scenes whose text and voice are unchanged are linked from the cache instead of re-synthesized.
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        def synthesize(idx: int, text: str) -> Path:
+            output_file = output_dir / f"{idx}.mp3"
+            cache_key = cls._cache_key(text, output_file, **kwargs) if cache else None
+            if cache_key and cache.materialize(cache_key, output_file):
+                return output_file
+
+            # Puede ser un hardlink a la caché: se desenlaza para no sobrescribir la entrada cacheada
+            output_file.unlink(missing_ok=True)
+            for attempt in range(retries + 1):
+                try:
+                    cls.generate_speech(text=text, output_file=output_file, **kwargs)
+                    break
+                except Exception as e:
+                    if attempt == retries or not _is_retryable(e):
+                        raise Exception(f"Error generating TTS for scene {idx}: {str(e)}") from e
+                    time.sleep(backoff * 2 ** attempt)
+
+            if cache_key:
+                cache.put(cache_key, output_file)
+            return output_file
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            return list(executor.map(synthesize, range(len(texts)), texts))
+
+    @classmethod
+    def _cache_key(cls, text: str, output_file: Path, **kwargs) -> str:
+        arguments = inspect.signature(cls.generate_speech).bind_partial(text=text, output_file=output_file, **kwargs)
+        arguments.apply_defaults()
+        return TTSCache.make_key(
+            provider=cls.__name__,
+            model=arguments.arguments.get('model'),
+            voice=arguments.arguments.get('voice'),
+            voice_settings=cls.VOICE_SETTINGS,
+            text=text
+        )
+
 class GoogleTTS(TTS):
     @staticmethod
     def generate_speech(
@@ -124,6 +258,11 @@ class OpenaiTTS(TTS):
         return str(speech_file_path)
     
 class ElevenLabsTTS(TTS):
+    VOICE_SETTINGS = {
+        "stability": 0.5,
+        "similarity_boost": 0.8
+    }
+
     @staticmethod
     def generate_speech(
         text: str,
@@ -147,13 +286,10 @@ class ElevenLabsTTS(TTS):
         data = {
             "text": text,
             "model_id": model.value,
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.8
-            }
+            "voice_settings": ElevenLabsTTS.VOICE_SETTINGS
         }
         
-        response = requests.post(url, json=data, headers=headers, stream=True)
+        response = HTTP_SESSION.post(url, json=data, headers=headers, stream=True)
         
         if response.status_code == 200:
             with open(output_file, "wb") as f:
@@ -162,7 +298,7 @@ class ElevenLabsTTS(TTS):
                         f.write(chunk)
             return output_file
         else:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
+            raise requests.HTTPError(f"Error: {response.status_code}, {response.text}", response=response)
 
 if __name__ == "__main__":
     import json
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+
+class DiskLRU:
+    """Size-bounded LRU bookkeeping of the files of an on-disk cache, shared by the LLM, TTS and image caches.
+
+    Sizes and last uses are kept in memory, so lookups, writes and evictions never scan the directory.
+    With an `index_path` they are persisted there together with the pin flags; without one they are
+    rebuilt at start-up from the files' sizes and modification times, which `touch` keeps up to date.
+    Pinned entries are never evicted. It is not thread-safe: caches call it under their own lock.
+    """
+    def __init__(self, cache_dir: Path, suffix: str, max_bytes: int, index_path: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if index_path is not None:
+            if index_path.exists():
+                self.entries = json.loads(index_path.read_text(encoding='utf-8'))
+        else:
+            for path in self.cache_dir.glob(f'*{suffix}'):
+                stat = path.stat()
+                self.entries[path.stem] = {'file': path.name, 'size': stat.st_size, 'last_used': stat.st_mtime, 'pinned': False}
+        self.total_bytes = sum(entry['size'] for entry in self.entries.values())
+
+    def get(self, key: str) -> Optional[Path]:
+        """File of a cached entry, or None; entries whose file was deleted are dropped."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        path = self.cache_dir / entry['file']
+        if not path.exists():
+            self.remove(key)
+            return None
+        return path
+
+    def touch(self, key: str) -> None:
+        entry = self.entries[key]
+        entry['last_used'] = time.time()
+        if self.index_path is None:
+            os.utime(self.cache_dir / entry['file'])  # Sin índice, la fecha de modificación guarda el último uso
+        self._save_index()
+
+    def put(self, key: str, data: Union[bytes, Path], pinned: bool = False, suffix: Optional[str] = None) -> Path:
+        """Stores `data` (bytes or a file to copy) atomically under `key` and evicts if the cache grew too big."""
+        file_name = f"{key}{suffix or self.suffix}"
+        path = self.cache_dir / file_name
+        tmp_path = self.cache_dir / f"{file_name}.tmp"
+        if isinstance(data, bytes):
+            tmp_path.write_bytes(data)
+        else:
+            shutil.copyfile(data, tmp_path)
+        os.replace(tmp_path, path)
+
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous['size']
+            if previous['file'] != file_name:
+                (self.cache_dir / previous['file']).unlink(missing_ok=True)
+        size = path.stat().st_size
+        self.entries[key] = {
+            'file': file_name,
+            'size': size,
+            'last_used': time.time(),
+            'pinned': pinned or bool(previous and previous['pinned']),
+        }
+        self.total_bytes += size
+        self.evict()
+        return path
+
+    def set_pinned(self, key: str, pinned: bool) -> None:
+        self.entries[key]['pinned'] = pinned
+        self.evict()
+
+    def remove(self, key: str) -> None:
+        self._drop(key)
+        self._save_index()
+
+    def clear(self) -> None:
+        for key in list(self.entries):
+            self._drop(key)
+        self._save_index()
+
+    def evict(self) -> None:
+        if self.total_bytes > self.max_bytes:
+            unpinned = sorted((key for key, entry in self.entries.items() if not entry['pinned']),
+                              key=lambda key: self.entries[key]['last_used'])
+            for key in unpinned:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self._drop(key)
+        self._save_index()
+
+    def _drop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            (self.cache_dir / entry['file']).unlink(missing_ok=True)
+            self.total_bytes -= entry['size']
+
+    def _save_index(self) -> None:
+        if self.index_path is None:
+            return
+        tmp_path = self.index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.entries), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
@@ -1,12 +1,19 @@
 import os
 import io
+import json
+import time
 import base64
 import random
+import shutil
+import hashlib
 import requests
 from enum import Enum
 from dotenv import load_dotenv
 from abc import ABC, abstractmethod
-from typing import Union, List, Optional
+from threading import Lock
+from typing import Union, List, Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import replicate
@@ -15,6 +22,12 @@ from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 from diffusers import AutoPipelineForText2Image, FluxPipeline
 
+from generators.disk_cache import DiskLRU
+
+# Sesión HTTP compartida para reutilizar conexiones en las descargas
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
 class ImageGenerators():
     class Local(Enum):
         FAKE = 'FAKE'
@@ -45,6 +58,67 @@ class ImageGenerators():
             }
         }
 
+class ImageCache:
+    """On-disk image cache keyed by (generator, model, prompt, width, height, guidance, steps, seed).
+
+    `index.json` maps each key to its file, size, last use and pin flag, so lookups never scan the
+    directory. Unpinned entries are evicted least recently used once `max_bytes` is exceeded; images
+    the user approved are pinned and kept forever.
+    """
+    def __init__(self, cache_dir: Path = Path('cache/images'), max_bytes: int = 2 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / 'index.json'
+        self._lock = Lock()
+        self._lru = DiskLRU(self.cache_dir, '.png', max_bytes, index_path=self.index_path)
+
+    @property
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        return self._lru.entries
+
+    @staticmethod
+    def make_key(generator: str, model: str, prompt: str, width: int, height: int,
+                 guidance: float, steps: int, seed: Optional[int] = None) -> str:
+        payload = json.dumps({
+            'generator': generator,
+            'model': model,
+            'prompt': prompt,
+            'width': width,
+            'height': height,
+            'guidance': guidance,
+            'steps': steps,
+            'seed': seed,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def materialize(self, key: str, output_path: Path) -> bool:
+        with self._lock:
+            cache_file = self._lru.get(key)
+            if cache_file is None:
+                return False
+
+            self._lru.touch(key)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Copia y no enlace: los generadores reescriben las imágenes en su sitio y no deben tocar la caché
+            shutil.copy2(cache_file, output_path)
+            return True
+
+    def put(self, key: str, image_path: Path, pinned: bool = False) -> None:
+        with self._lock:
+            self._lru.put(key, image_path, pinned=pinned, suffix=image_path.suffix)
+
+    def pin(self, key: str, image_path: Optional[Path] = None) -> None:
+        """Pins an entry, adding `image_path` under `key` first if it is not cached yet."""
+        with self._lock:
+            if key in self._lru.entries:
+                self._lru.set_pinned(key, True)
+            elif image_path is not None and image_path.exists():
+                self._lru.put(key, image_path, pinned=True, suffix=image_path.suffix)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            if key in self._lru.entries:
+                self._lru.set_pinned(key, False)
+
 class ImageGenerator(ABC):
     def __new__(cls, generator: ImageGenerators, generator_config: dict = None):
         if cls is ImageGenerator:
@@ -166,16 +240,22 @@ class SDXLTURBO(ImageGenerator):
         return pipe
 
 class ReplicateFluxDev():
-    def __init__(self, verbose: bool = True):
+    MODEL = "black-forest-labs/flux-dev"
+
+    def __init__(self, verbose: bool = True, max_in_flight: int = 4):
         load_dotenv()
         self.api_token = os.getenv('REPLICATE_API_TOKEN')
         if not self.api_token:
             raise ValueError("REPLICATE_API_TOKEN not found in environment variables")
         self.verbose = verbose
+        self.max_in_flight = max_in_flight
 
-    def generate_images(self, prompts: Union[str, List[str]], output_dir: Path, **kwargs) -> None:
+    def generate_images(self, prompts: Union[str, List[str]], output_dir: Path, max_in_flight: Optional[int] = None,
+                        cache: Optional[ImageCache] = None, **kwargs) -> None:
         generation_config = ImageGenerators.Replicate.FLUX1_SCHNELL.value.get('config').copy()
         generation_config.update(**kwargs)
+        # ImageGenerator.__new__ devuelve esta clase sin llamar a __init__, de ahí el getattr
+        max_in_flight = max_in_flight or getattr(self, 'max_in_flight', 4)
 
         if isinstance(output_dir, Path) and output_dir.suffix == ".png":
             output_file = output_dir
@@ -188,9 +268,7 @@ class ReplicateFluxDev():
         if isinstance(prompts, str):
             prompts = [prompts]
         
-        for i, prompt in enumerate(tqdm(prompts, desc=f"Generating {len(prompts)} images")):
-            result = self._query(prompt, **generation_config)
-            image_base64 = result[0].url
+        def generate(i: int, prompt: str) -> Path:
             if output_file:
                 if len(prompts) > 1:
                     image_path = output_dir / f"{output_file.stem}_{i+1:03d}{output_file.suffix}"
@@ -198,7 +276,23 @@ class ReplicateFluxDev():
                     image_path = output_file
             else:
                 image_path = output_dir / f"{i}.png"
+
+            cache_key = self.cache_key(prompt, **generation_config) if cache else None
+            if cache_key and cache.materialize(cache_key, image_path):
+                return image_path
+
+            result = self._query(prompt, **generation_config)
+            image_base64 = result[0].url
             self._save_image(image_base64, image_path)
+            if cache_key:
+                cache.put(cache_key, image_path)
+            return image_path
+
+        # Cada hilo solapa la predicción y la descarga de su prompt con las de los demás
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+            futures = [executor.submit(generate, i, prompt) for i, prompt in enumerate(prompts)]
+            for future in tqdm(futures, desc=f"Generating {len(prompts)} images"):
+                future.result()
 
         #     if self.verbose:
         #         print(f"Image saved: {image_path}")
@@ -206,6 +300,21 @@ class ReplicateFluxDev():
         # if self.verbose:
         #     print(f"All images generated and saved in: {output_dir}")
 
+    @classmethod
+    def cache_key(cls, prompt: str, **kwargs) -> str:
+        generation_config = ImageGenerators.Replicate.FLUX1_SCHNELL.value.get('config').copy()
+        generation_config.update(**kwargs)
+        return ImageCache.make_key(
+            generator=cls.__name__,
+            model=cls.MODEL,
+            prompt=prompt,
+            width=generation_config.get('width'),
+            height=generation_config.get('height'),
+            guidance=generation_config.get('guidance_scale', 3.5),
+            steps=generation_config.get('num_inference_steps', 28),
+            seed=generation_config.get('seed')
+        )
+
     def _query(self, prompt: str, **kwargs):
         input_data = {
             "prompt": prompt,
@@ -220,7 +329,7 @@ class ReplicateFluxDev():
         }
         
         output = replicate.run(
-            "black-forest-labs/flux-dev",
+            self.MODEL,
             input=input_data
         )
         return output
@@ -235,13 +344,15 @@ class ReplicateFluxDev():
             f.write(image_data)
     
     def _save_image(self, image_url: str, save_path: Path):
-        response = requests.get(image_url)
-        response.raise_for_status() # Raise exception for failed requests
-        
-        image_data = response.content
-        
-        with open(save_path, 'wb') as f:
-            f.write(image_data)
+        tmp_path = save_path.with_suffix(save_path.suffix + '.part')
+        with HTTP_SESSION.get(image_url, stream=True) as response:
+            response.raise_for_status() # Raise exception for failed requests
+
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if chunk:
+                        f.write(chunk)
+        tmp_path.replace(save_path)
 
     def _load_pipeline(self) -> None:
         pass
@@ -358,6 +469,17 @@ class FakeImageGenerator(ImageGenerator):
     def _load_pipeline(self) -> None:
         pass
 
+# Generadores cuyas imágenes pasan por ImageCache. Los locales no se cachean: repetirlos no cuesta dinero,
+# y por eso tampoco se fijan sus imágenes aprobadas
+CACHED_IMAGE_GENERATORS = {
+    ImageGenerators.Replicate.FLUX1_SCHNELL: ReplicateFluxDev,
+}
+
+def image_cache_key(generator: ImageGenerators, prompt: str, **kwargs) -> Optional[str]:
+    """ImageCache key of `prompt` for `generator` without instantiating it, or None if it is not cached."""
+    generator_class = CACHED_IMAGE_GENERATORS.get(generator)
+    return generator_class.cache_key(prompt, **kwargs) if generator_class else None
+
 if __name__ == "__main__":
 
     import time
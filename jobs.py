@@ -0,0 +1,183 @@
+import time
+import uuid
+import traceback
+from enum import Enum
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from pydantic import BaseModel, Field
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    kind: str
+    resource: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: float = Field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+class JobManager:
+    """Runs blocking work (LLMs, image APIs, TTS, video renders) off the event loop.
+
+    Each resource gets its own thread pool sized to its concurrency limit, so e.g. only one
+    video renders at a time while several image requests are in flight. Jobs are persisted as
+    JSON under `jobs_path`. On `restore()` queued jobs are queued again, but jobs that were
+    running when the server stopped are only re-run if their handler was registered as
+    `resumable`; the rest are marked failed so a render or paid API call is never repeated
+    behind the user's back. Finished jobs older than `retention` seconds are deleted.
+    """
+    def __init__(self, jobs_path: Path, resource_limits: Dict[str, int], retention: float = 7 * 24 * 3600):
+        self.jobs_path = jobs_path
+        self.resource_limits = resource_limits
+        self.retention = retention
+        self._handlers: Dict[str, tuple[Callable[..., Any], str]] = {}
+        self._resumable: set[str] = set()
+        self._executors: Dict[str, ThreadPoolExecutor] = {
+            resource: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"jobs-{resource}")
+            for resource, limit in resource_limits.items()
+        }
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = Lock()
+
+    def register(self, kind: str, resource: str, resumable: bool = False) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """`resumable` handlers are safe to run again after being interrupted (e.g. they continue from checkpoints)."""
+        if resource not in self._executors:
+            raise ValueError(f"Unknown resource: {resource}")
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            self._handlers[kind] = (func, resource)
+            if resumable:
+                self._resumable.add(kind)
+            return func
+        return decorator
+
+    def submit(self, kind: str, **params) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        self.prune()
+        _, resource = self._handlers[kind]
+        job = Job(kind=kind, resource=resource, params=params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._save(job)
+            self._futures[job.id] = self._executors[resource].submit(self._run, job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, status: Optional[JobStatus] = None) -> List[Job]:
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if status is None or job.status == status]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Queued jobs are dropped; running jobs finish their current call but their result is discarded."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+
+            job.cancel_requested = True
+            future = self._futures.get(job_id)
+            if job.status == JobStatus.QUEUED and (future is None or future.cancel()):
+                job.status = JobStatus.CANCELLED
+                job.finished_at = time.time()
+            self._save(job)
+            return job
+
+    def restore(self) -> None:
+        self.jobs_path.mkdir(parents=True, exist_ok=True)
+        for job_file in self.jobs_path.glob("*.json"):
+            job = Job.model_validate_json(job_file.read_text(encoding='utf-8'))
+            with self._lock:
+                if job.id in self._jobs:
+                    continue
+                self._jobs[job.id] = job
+                if job.finished or job.kind not in self._handlers:
+                    continue
+
+                if job.cancel_requested:
+                    job.status = JobStatus.CANCELLED
+                    job.finished_at = time.time()
+                elif job.status == JobStatus.RUNNING and job.kind not in self._resumable:
+                    job.status = JobStatus.FAILED
+                    job.error = "Interrupted by a server restart; submit it again to retry"
+                    job.finished_at = time.time()
+                else:
+                    job.status = JobStatus.QUEUED
+                    job.started_at = None
+                    self._futures[job.id] = self._executors[job.resource].submit(self._run, job.id)
+                self._save(job)
+        self.prune()
+
+    def prune(self) -> None:
+        """Deletes finished jobs (in memory and on disk) that finished more than `retention` seconds ago."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and (job.finished_at or 0) < cutoff]:
+                del self._jobs[job_id]
+                (self.jobs_path / f"{job_id}.json").unlink(missing_ok=True)
+
+    def shutdown(self, wait: bool = False) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.cancel_requested:
+                # El trabajo se canceló cuando ya había empezado a ejecutarse y future.cancel() falló
+                job.status = JobStatus.CANCELLED
+                job.finished_at = time.time()
+                self._futures.pop(job_id, None)
+                self._save(job)
+                return
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            self._save(job)
+
+        func, _ = self._handlers[job.kind]
+        try:
+            result = func(**job.params)
+            status, error = JobStatus.COMPLETED, None
+        except Exception as e:
+            traceback.print_exc()
+            result, status, error = None, JobStatus.FAILED, str(e)
+
+        with self._lock:
+            if job.cancel_requested:
+                result, status = None, JobStatus.CANCELLED
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            self._futures.pop(job_id, None)
+            self._save(job)
+
+    def _save(self, job: Job) -> None:
+        self.jobs_path.mkdir(parents=True, exist_ok=True)
+        job_file = self.jobs_path / f"{job.id}.json"
+        tmp_file = job_file.with_suffix('.tmp')
+        tmp_file.write_text(job.model_dump_json(indent=4), encoding='utf-8')
+        tmp_file.replace(job_file)
@@ -146,6 +146,20 @@ class WriterPrompts():
             """
             return clean_text(prompt)
 
+        def evaluate_all() -> str:
+            prompt = """
+            Eres un comité formado por un historiador experto, un experto en narrativa y storytelling y un psicólogo especializado en el impacto emocional de la narrativa.
+            Tu tarea es evaluar el texto proporcionado según tres criterios, cada uno en una escala del 1 al 10:
+            - Precisión histórica: 1 es completamente inexacto y 10 es totalmente preciso históricamente.
+            - Calidad del storytelling: considera la estructura, el desarrollo de personajes, el arco narrativo y el engagement. 1 es muy pobre y 10 es excelente.
+            - Impacto emocional: considera su capacidad para evocar emociones, crear conexiones empáticas y dejar una impresión duradera. 1 es nulo impacto y 10 es impacto extremadamente fuerte.
+            Responde únicamente con las tres puntuaciones, cada una dentro de su etiqueta y sin ningún otro texto:
+            <historical_accuracy>número</historical_accuracy>
+            <storytelling_quality>número</storytelling_quality>
+            <emotional_impact>número</emotional_impact>
+            """
+            return clean_text(prompt)
+
 class StoryboarderPrompts:    
     class User():
         def generate_storyboard_visual_analysis(text: str) -> str:
@@ -1,30 +1,61 @@
+import shutil
 from abc import ABC
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from tqdm import tqdm
 from pathlib import Path
 
 from generators.LLM import LLM
 from tools.writer import Writer
 from tools.storyboarder import Storyboarder
-from data_types import SerieData, VideoData, VideoYoutubeDetails, VideoProductionStatus
+from data_types import SerieData, VideoData, VideoYoutubeDetails, VideoProductionStatus, StoryCheckpoint
 
 class SerieGenerator(ABC):
     def __init__(self, llm: LLM, serie_data: SerieData):
         self.writer = Writer(llm=llm)
         self.storyboarder = Storyboarder(llm=llm)
         self.serie_data: SerieData = serie_data
+        self._themes_lock = Lock()
 
     def generate_serie(self) -> list[VideoData]:
         pass
 
 class ShortsSerieGenerator(SerieGenerator):
-    def generate_serie(self) -> SerieData:
-        videos: VideoData = []
-        for i in tqdm(range(self.serie_data.num_stories), desc="Generating videos"):
-            video = self._generate_video_text()
-            print(f"Generating storyboard for video: {video.youtube_details.title}...")
-            video.storyboard = self.storyboarder.generate_storyboard(text=video.text)
-            video.production_status.storyboard_completed = True
-            videos.append(video)
+    @classmethod
+    def resume(cls, llm: LLM, json_data_path: Path, max_workers: int = 1) -> SerieData:
+        serie_data = SerieData.get(Path(json_data_path))
+        generator = cls(llm=llm, serie_data=serie_data)
+        # Los checkpoints se borran al terminar: sin ellos y con todos los vídeos la serie ya está completa
+        if generator.is_complete():
+            print(f"Serie already complete: {json_data_path}")
+            return serie_data
+        return generator.generate_serie(max_workers=max_workers)
+
+    def is_complete(self) -> bool:
+        return (
+            self.serie_data.num_stories is not None
+            and len(self.serie_data.videos) >= self.serie_data.num_stories
+            and not self.checkpoints_path.exists()
+        )
+
+    @property
+    def checkpoints_path(self) -> Path:
+        return Path(self.serie_data.serie_path) / "checkpoints"
+
+    def generate_serie(self, max_workers: int = 1) -> SerieData:
+        # Se guarda la serie antes de empezar para poder reanudarla con resume() si algo falla
+        self.serie_data.save()
+        for slot in range(self.serie_data.num_stories):
+            theme = StoryCheckpoint.load(self._checkpoint_path(slot)).theme
+            if theme and theme not in self.serie_data.used_themes:
+                self.serie_data.used_themes.append(theme)
+
+        videos: list[VideoData] = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(self._generate_video, slot) for slot in range(self.serie_data.num_stories)]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Generating videos"):
+                videos.append(future.result())
 
         print("\nSorting stories by score...")
         videos.sort(key=lambda x: x.production_status.text_evaluation['average_score'], reverse=True)
@@ -35,49 +66,81 @@ class ShortsSerieGenerator(SerieGenerator):
         
         self.serie_data.videos = videos
         self.serie_data.save()
+        shutil.rmtree(self.checkpoints_path, ignore_errors=True)
         return self.serie_data
 
-    def _generate_video_text(self) -> VideoData:
-        total_cost = 0
-        print("Generating theme for text...")
-        theme_response = self.writer.generate_theme(
-                expertise=self.serie_data.expertise,
-                serie_theme=self.serie_data.serie_theme,
-                used_themes=self.serie_data.used_themes
-            )
-        total_cost += theme_response['cost']
-        self.serie_data.used_themes.append(theme_response['text'])
-        print(f"Theme generated: {theme_response['text']}")
-
-        print("Generating initial story...")
-        story_response = self.writer.generate_story(self.serie_data.expertise, theme_response['text'])
-        total_cost += story_response['cost']
-        print("Initial story generated")
-
-        print("Improving story...")
-        improved_response = self.writer.improve_story(self.serie_data.expertise, story_response['text'])
-        total_cost += improved_response['cost']
-        print("Story improved")
-
-        print("Evaluating story...")
-        evaluation = self.writer.evaluate_text(improved_response['text'])
+    def _checkpoint_path(self, slot: int) -> Path:
+        return self.checkpoints_path / f"{slot}.json"
+
+    def _generate_video(self, slot: int) -> VideoData:
+        checkpoint_path = self._checkpoint_path(slot)
+        checkpoint = StoryCheckpoint.load(checkpoint_path)
+
+        video = self._generate_video_text(checkpoint, checkpoint_path)
+
+        if checkpoint.storyboard is None:
+            print(f"Generating storyboard for video: {video.youtube_details.title}...")
+            checkpoint.storyboard = self.storyboarder.generate_storyboard(text=video.text)
+            checkpoint.save(checkpoint_path)
+
+        video.storyboard = checkpoint.storyboard
+        video.production_status.storyboard_completed = True
+        return video
+
+    def _generate_video_text(self, checkpoint: StoryCheckpoint, checkpoint_path: Path) -> VideoData:
+        if checkpoint.theme is None:
+            print("Generating theme for text...")
+            # Los temas se eligen de uno en uno para que used_themes siga siendo único
+            with self._themes_lock:
+                theme_response = self.writer.generate_theme(
+                        expertise=self.serie_data.expertise,
+                        serie_theme=self.serie_data.serie_theme,
+                        used_themes=self.serie_data.used_themes
+                    )
+                self.serie_data.used_themes.append(theme_response['text'])
+            checkpoint.theme = theme_response['text']
+            checkpoint.text_cost += theme_response['cost']
+            checkpoint.save(checkpoint_path)
+            print(f"Theme generated: {checkpoint.theme}")
+
+        if checkpoint.draft is None:
+            print("Generating initial story...")
+            story_response = self.writer.generate_story(self.serie_data.expertise, checkpoint.theme)
+            checkpoint.draft = story_response['text']
+            checkpoint.text_cost += story_response['cost']
+            checkpoint.save(checkpoint_path)
+            print("Initial story generated")
+
+        if checkpoint.improved_text is None:
+            print("Improving story...")
+            improved_response = self.writer.improve_story(self.serie_data.expertise, checkpoint.draft)
+            checkpoint.improved_text = improved_response['text']
+            checkpoint.text_cost += improved_response['cost']
+            checkpoint.save(checkpoint_path)
+            print("Story improved")
+
+        if checkpoint.text_evaluation is None:
+            print("Evaluating story...")
+            checkpoint.text_evaluation = self.writer.evaluate_text(checkpoint.improved_text)
+            checkpoint.text_cost += checkpoint.text_evaluation['cost']
+            checkpoint.save(checkpoint_path)
 
         return VideoData(
             json_data_path = None,
             video_path = None,
-            text = improved_response['text'],
+            text = checkpoint.improved_text,
             video_n=None,
             youtube_details = VideoYoutubeDetails(
-                title = theme_response['text'],
-                description = improved_response['text'],
+                title = checkpoint.theme,
+                description = checkpoint.improved_text,
                 video_type = 'short',
             ),
             production_status = VideoProductionStatus(
                 text_completed=True,
-                text_evaluation=evaluation,
+                text_evaluation=checkpoint.text_evaluation,
                 assets_path= None
             ),
-            text_cost=total_cost,
+            text_cost=checkpoint.text_cost,
         )
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los módulos del proyecto se importan desde la raíz del repositorio (p. ej. `from data_types import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
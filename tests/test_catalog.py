@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import data_types
+from catalog import ChannelCatalog
+from data_types import SerieData, SerieSummary, VideoData, VideoSummary, VideoYoutubeDetails, VideoProductionStatus
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_types, "_save_listeners", [])
+    catalog = ChannelCatalog(tmp_path / "channel", db_path=tmp_path / "catalog.sqlite")
+    yield catalog
+    catalog.close()
+
+
+def make_serie(channel_path, name: str, n_videos: int = 2) -> SerieData:
+    serie_path = channel_path / name.lower()
+    serie = SerieData(
+        json_data_path=serie_path / "data.json", serie_path=serie_path, name=name, num_stories=n_videos,
+        videos=[
+            VideoData(json_data_path=serie_path / str(n) / "video_data.json", video_n=n, text="long text",
+                      youtube_details=VideoYoutubeDetails(title=f"{name} {n}"))
+            for n in range(1, n_videos + 1)
+        ],
+    )
+    serie.save()
+    return serie
+
+
+def test_refresh_indexes_series_and_video_summaries(catalog):
+    make_serie(catalog.channel_path, "Myths")
+    make_serie(catalog.channel_path, "Gods", n_videos=1)
+
+    catalog.refresh()
+    series = catalog.get_series()
+
+    assert [serie.name for serie in series] == ["Gods", "Myths"]
+    assert [video.youtube_details.title for video in series[1].videos] == ["Myths 1", "Myths 2"]
+    assert not hasattr(series[1].videos[0], "text")  # el índice solo guarda los resúmenes
+
+
+def test_catalog_entries_are_read_only_summaries(catalog):
+    make_serie(catalog.channel_path, "Myths")
+    catalog.refresh()
+
+    serie = catalog.get_series()[0]
+
+    assert isinstance(serie, SerieSummary) and isinstance(serie.videos[0], VideoSummary)
+    assert not hasattr(serie, "save") and not hasattr(serie.videos[0], "save")
+    assert serie.load().videos[0].text == "long text"
+    assert serie.videos[0].load().text == "long text"
+
+
+def test_refresh_only_parses_modified_files(catalog, monkeypatch):
+    serie = make_serie(catalog.channel_path, "Myths")
+    catalog.refresh()
+    parsed = []
+    original = VideoData.model_validate_json
+    monkeypatch.setattr(VideoData, "model_validate_json", classmethod(lambda cls, data: parsed.append(data) or original(data)))
+
+    catalog.refresh()
+    assert parsed == []
+
+    video = serie.videos[0]
+    video.production_status = VideoProductionStatus(ready_to_upload=True)
+    video.json_data_path.write_text(video.model_dump_json(), encoding='utf-8')
+    mtime = video.json_data_path.stat().st_mtime + 10  # por si el sistema de ficheros tiene poca resolución
+    os.utime(video.json_data_path, (mtime, mtime))
+    catalog.refresh()
+
+    assert len(parsed) == 1
+    assert catalog.get_series()[0].videos[0].production_status.ready_to_upload
+
+
+def test_refresh_drops_deleted_files(catalog):
+    serie = make_serie(catalog.channel_path, "Myths")
+    catalog.refresh()
+
+    serie.videos[1].json_data_path.unlink()
+    catalog.refresh()
+
+    assert [video.video_n for video in catalog.get_series()[0].videos] == [1]
+
+
+def test_saves_update_the_catalog_through_the_listener(catalog):
+    data_types.add_save_listener(catalog.on_save)
+    serie = make_serie(catalog.channel_path, "Myths")
+
+    video = serie.videos[0]
+    video.youtube_details.title = "Renamed"
+    video.save()
+
+    assert [video.youtube_details.title for video in catalog.get_series()[0].videos] == ["Renamed", "Myths 2"]
+
+
+def test_saves_outside_the_channel_are_ignored(catalog, tmp_path):
+    data_types.add_save_listener(catalog.on_save)
+    make_serie(tmp_path / "elsewhere", "Other")
+
+    assert catalog.get_series() == []
@@ -0,0 +1,162 @@
+import pytest
+
+import data_types
+from data_types import SerieData, VideoData, VideoCollection, VideoSummary, VideoYoutubeDetails
+
+
+@pytest.fixture(autouse=True)
+def saved(monkeypatch):
+    """Records every object passed to the save listeners."""
+    saved = []
+    monkeypatch.setattr(data_types, "_save_listeners", [saved.append])
+    yield saved
+    data_types.flush_pending_saves()
+
+
+def make_serie(tmp_path, n_videos: int = 3) -> SerieData:
+    serie = SerieData(
+        json_data_path=tmp_path / "data.json", serie_path=tmp_path, name="Serie", num_stories=n_videos,
+        videos=[VideoData(json_data_path=tmp_path / str(n) / "video_data.json", video_n=n, text=f"text {n}",
+                          youtube_details=VideoYoutubeDetails(title=f"title {n}"))
+                for n in range(1, n_videos + 1)],
+    )
+    serie.save()
+    return serie
+
+
+def test_serie_videos_are_loaded_lazily_in_folder_order(tmp_path):
+    make_serie(tmp_path, n_videos=11)
+
+    serie = SerieData.get(tmp_path / "data.json")
+    videos = serie.videos
+
+    assert isinstance(videos, VideoCollection)
+    assert len(videos) == 11 and videos.loaded() == []
+    assert videos[9].video_n == 10 and [video.video_n for video in videos.loaded()] == [10]
+    assert [video.video_n for video in videos[-2:]] == [10, 11]
+    assert [video.video_n for video in videos] == list(range(1, 12))
+
+
+def test_serie_save_only_rewrites_loaded_videos(tmp_path, saved):
+    make_serie(tmp_path)
+    serie = SerieData.get(tmp_path / "data.json")
+    serie.videos[1].text = "edited"
+    saved.clear()
+
+    serie.save()
+
+    assert [type(data).__name__ for data in saved] == ["VideoData"]
+    assert VideoData.get(tmp_path / "2" / "video_data.json").text == "edited"
+
+
+def test_summaries_skip_the_full_video_data(tmp_path):
+    make_serie(tmp_path, n_videos=5)
+    videos = SerieData.get(tmp_path / "data.json").videos
+
+    page = videos.page(1, page_size=2)
+
+    assert [type(summary) for summary in page] == [VideoSummary, VideoSummary]
+    assert [summary.youtube_details.title for summary in page] == ["title 3", "title 4"]
+    assert videos.page(2, page_size=2)[0].video_n == 5 and videos.page(3, page_size=2) == []
+    assert videos.loaded() == []
+    assert page[0].load().text == "text 3"
+
+    videos[0].text = "edited"
+    assert videos.summary(0) is videos[0]  # un vídeo ya cargado sirve de resumen con sus cambios
+
+
+def test_assigning_videos_replaces_the_stored_ones(tmp_path):
+    make_serie(tmp_path)
+    serie = SerieData.get(tmp_path / "data.json")
+
+    serie.videos = [VideoData(json_data_path=tmp_path / "9" / "video_data.json", video_n=9)]
+
+    assert isinstance(serie.videos, list) and [video.video_n for video in serie.videos] == [9]
+
+
+def test_serie_json_does_not_embed_the_videos(tmp_path):
+    make_serie(tmp_path)
+    assert '"videos": []' in (tmp_path / "data.json").read_text()
+    assert SerieData.model_validate_json((tmp_path / "data.json").read_text()).video_list == []
+
+
+def test_saves_are_atomic_and_skip_unchanged_documents(tmp_path, saved):
+    path = tmp_path / "1" / "video_data.json"
+    video = VideoData(json_data_path=path, text="text")
+    video.save()
+    mtime = path.stat().st_mtime_ns
+
+    video.save()
+    VideoData.get(path).save()
+
+    assert path.stat().st_mtime_ns == mtime and len(saved) == 1
+    assert list(path.parent.iterdir()) == [path]  # no quedan temporales
+
+    video.text = "changed"
+    video.save()
+    assert VideoData.get(path).text == "changed" and len(saved) == 2
+
+
+def test_unchanged_saves_rewrite_a_deleted_file(tmp_path):
+    path = tmp_path / "video_data.json"
+    video = VideoData(json_data_path=path, text="text")
+    video.save()
+    path.unlink()
+
+    video.save()
+
+    assert path.exists()
+
+
+def test_failed_writes_leave_the_previous_file(tmp_path, monkeypatch):
+    path = tmp_path / "video_data.json"
+    VideoData(json_data_path=path, text="original").save()
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(type(path), "replace", fail)
+
+    with pytest.raises(OSError):
+        VideoData(json_data_path=path, text="new").save()
+
+    assert VideoData.model_validate_json(path.read_text()).text == "original"
+
+
+def test_delayed_saves_coalesce_into_one_write(tmp_path, saved):
+    path = tmp_path / "video_data.json"
+    VideoData(json_data_path=path, text="v0").save()
+    saved.clear()
+
+    for n in range(1, 6):
+        video = VideoData.get(path)
+        video.text = f"v{n}"
+        video.save(delay=60)
+
+    # Las lecturas ven el último guardado aunque aún no esté en disco
+    assert VideoData.get(path).text == "v5"
+    assert VideoData.model_validate_json(path.read_text()).text == "v0" and saved == []
+
+    data_types.flush_pending_saves()
+
+    assert VideoData.model_validate_json(path.read_text()).text == "v5" and len(saved) == 1
+
+
+def test_delayed_saves_are_written_after_the_delay(tmp_path):
+    path = tmp_path / "video_data.json"
+    VideoData(json_data_path=path, text="late").save(delay=0.05)
+    assert not path.exists()
+
+    timer = data_types._coalescer._timers[path.resolve()]
+    timer.join(2)
+
+    assert VideoData.model_validate_json(path.read_text()).text == "late"
+
+
+def test_immediate_saves_replace_pending_ones(tmp_path):
+    path = tmp_path / "video_data.json"
+    VideoData(json_data_path=path, text="pending").save(delay=60)
+    VideoData(json_data_path=path, text="now").save()
+
+    data_types.flush_pending_saves()
+
+    assert VideoData.model_validate_json(path.read_text()).text == "now"
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from generators.disk_cache import DiskLRU
+
+
+def test_least_recently_used_unpinned_entries_are_evicted(tmp_path):
+    lru = DiskLRU(tmp_path, '.bin', max_bytes=10)
+    lru.put("pinned", b"1234", pinned=True)
+    lru.put("old", b"123")
+    lru.put("new", b"123")
+    lru.touch("old")  # "new" pasa a ser la menos reciente
+
+    lru.put("newest", b"123")
+
+    assert set(lru.entries) == {"pinned", "old", "newest"}
+    assert not (tmp_path / "new.bin").exists()
+    assert lru.total_bytes == 10
+
+
+def test_writes_and_evictions_do_not_scan_the_directory(tmp_path, monkeypatch):
+    lru = DiskLRU(tmp_path, '.bin', max_bytes=6)
+    monkeypatch.setattr(type(tmp_path), "glob", lambda *args: pytest.fail("the cache directory was scanned"))
+
+    for key in "abcd":
+        lru.put(key, b"123")
+    lru.put("d", b"12")  # reescribir una entrada no la cuenta dos veces
+
+    assert set(lru.entries) == {"c", "d"} and lru.total_bytes == 5
+
+
+def test_entries_are_rebuilt_from_file_times_without_an_index(tmp_path):
+    lru = DiskLRU(tmp_path, '.bin', max_bytes=100)
+    for age, key in enumerate("ab"):
+        path = lru.put(key, b"123")
+        stamp = time.time() - 100 + age
+        os.utime(path, (stamp, stamp))
+    lru.touch("a")
+
+    reloaded = DiskLRU(tmp_path, '.bin', max_bytes=3)
+    reloaded.evict()
+
+    assert set(reloaded.entries) == {"a"}
+
+
+def test_index_persists_pins_and_drops_deleted_files(tmp_path):
+    index_path = tmp_path / "index.json"
+    lru = DiskLRU(tmp_path, '.png', max_bytes=100, index_path=index_path)
+    source = tmp_path / "source.jpg"
+    source.write_bytes(b"image")
+    lru.put("a", source, pinned=True, suffix=".jpg")
+    lru.put("b", b"image")
+
+    reloaded = DiskLRU(tmp_path, '.png', max_bytes=100, index_path=index_path)
+    (tmp_path / "b.png").unlink()
+
+    assert reloaded.get("a") == tmp_path / "a.jpg" and reloaded.entries["a"]["pinned"]
+    assert reloaded.get("b") is None and "b" not in reloaded.entries
+    assert reloaded.total_bytes == 5
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+image_generator = pytest.importorskip("generators.image_generator")
+ImageCache, ImageGenerators = image_generator.ImageCache, image_generator.ImageGenerators
+
+
+def write_image(path, content: bytes = b"png"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def make_key(prompt: str = "a cat", **overrides) -> str:
+    params = dict(generator="Gen", model="model", prompt=prompt, width=768, height=1344, guidance=3.5, steps=28, seed=None)
+    return ImageCache.make_key(**{**params, **overrides})
+
+
+def test_key_depends_on_generation_parameters():
+    assert make_key() == make_key()
+    for overrides in [dict(prompt="a dog"), dict(width=512), dict(steps=4), dict(seed=1), dict(model="other")]:
+        assert make_key(**overrides) != make_key()
+
+
+def test_materialize_returns_the_stored_image(tmp_path):
+    cache = ImageCache(tmp_path / "cache")
+    key = make_key()
+    assert not cache.materialize(key, tmp_path / "out.png")
+
+    cache.put(key, write_image(tmp_path / "image.png", b"first"))
+
+    assert cache.materialize(key, tmp_path / "out.png")
+    assert (tmp_path / "out.png").read_bytes() == b"first"
+    assert ImageCache(tmp_path / "cache").materialize(key, tmp_path / "again.png")  # el índice persiste
+
+
+def test_overwriting_a_materialized_image_keeps_the_cached_one(tmp_path):
+    cache = ImageCache(tmp_path / "cache")
+    cache.pin("approved", write_image(tmp_path / "image.png", b"approved"))
+    cache.materialize("approved", tmp_path / "images" / "0.png")
+
+    (tmp_path / "images" / "0.png").write_bytes(b"regenerated")  # como hacen los generadores locales
+
+    assert cache.materialize("approved", tmp_path / "again.png")
+    assert (tmp_path / "again.png").read_bytes() == b"approved"
+
+
+def test_unpinned_entries_are_evicted_lru_and_pinned_ones_kept(tmp_path):
+    cache = ImageCache(tmp_path / "cache", max_bytes=10)
+    cache.pin("pinned", write_image(tmp_path / "pinned.png", b"12345"))
+    cache.put("old", write_image(tmp_path / "old.png", b"123"))
+    cache.index["old"]["last_used"] = time.time() - 100
+    cache.put("new", write_image(tmp_path / "new.png", b"123"))
+
+    assert set(cache.index) == {"pinned", "new"}
+    assert not (tmp_path / "cache" / "old.png").exists()
+
+
+def test_unpinning_makes_an_entry_evictable(tmp_path):
+    cache = ImageCache(tmp_path / "cache", max_bytes=4)
+    cache.pin("approved", write_image(tmp_path / "approved.png", b"12345"))
+    assert "approved" in cache.index
+
+    cache.unpin("approved")
+
+    assert "approved" not in cache.index
+
+
+def test_pin_without_an_image_is_a_noop(tmp_path):
+    cache = ImageCache(tmp_path / "cache")
+    cache.pin("missing", tmp_path / "missing.png")
+    assert "missing" not in cache.index
+
+
+def test_cache_keys_only_exist_for_cached_generators():
+    replicate = ImageGenerators.Replicate.FLUX1_SCHNELL
+
+    key = image_generator.image_cache_key(replicate, "a cat", width=768, height=1344)
+
+    assert key == image_generator.ReplicateFluxDev.cache_key("a cat", width=768, height=1344)
+    assert key != image_generator.image_cache_key(replicate, "a cat", width=512, height=1344)
+    assert image_generator.image_cache_key(ImageGenerators.Local.FAKE, "a cat") is None
@@ -0,0 +1,130 @@
+import time
+import threading
+
+import pytest
+
+from jobs import Job, JobManager, JobStatus
+
+
+def make_manager(jobs_path, **kwargs) -> JobManager:
+    return JobManager(jobs_path, resource_limits={"cpu": 1}, **kwargs)
+
+
+def wait_finished(manager: JobManager, job_id: str, timeout: float = 5) -> Job:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"job {job_id} did not finish")
+
+
+def write_job(jobs_path, **fields) -> Job:
+    jobs_path.mkdir(parents=True, exist_ok=True)
+    job = Job(resource="cpu", **fields)
+    (jobs_path / f"{job.id}.json").write_text(job.model_dump_json(), encoding='utf-8')
+    return job
+
+
+def test_submit_runs_the_handler_and_persists_the_result(tmp_path):
+    manager = make_manager(tmp_path)
+    manager.register("add", "cpu")(lambda a, b: a + b)
+
+    job = wait_finished(manager, manager.submit("add", a=1, b=2).id)
+
+    assert job.status == JobStatus.COMPLETED and job.result == 3
+    assert Job.model_validate_json((tmp_path / f"{job.id}.json").read_text()).result == 3
+    manager.shutdown(wait=True)
+
+
+def test_failures_are_recorded(tmp_path):
+    manager = make_manager(tmp_path)
+
+    @manager.register("fail", "cpu")
+    def fail():
+        raise RuntimeError("boom")
+
+    job = wait_finished(manager, manager.submit("fail").id)
+
+    assert job.status == JobStatus.FAILED and job.error == "boom"
+    manager.shutdown(wait=True)
+
+
+def test_unknown_kinds_and_resources_are_rejected(tmp_path):
+    manager = make_manager(tmp_path)
+    with pytest.raises(ValueError):
+        manager.register("x", "gpu")
+    with pytest.raises(ValueError):
+        manager.submit("x")
+
+
+def test_cancel_drops_queued_jobs_and_discards_running_results(tmp_path):
+    manager = make_manager(tmp_path)
+    release = threading.Event()
+    manager.register("block", "cpu")(lambda: release.wait(5) and "done")
+
+    running = manager.submit("block")
+    queued = manager.submit("block")
+    while manager.get(running.id).status != JobStatus.RUNNING:
+        time.sleep(0.01)
+
+    assert manager.cancel(queued.id).status == JobStatus.CANCELLED
+    manager.cancel(running.id)
+    release.set()
+
+    job = wait_finished(manager, running.id)
+    assert job.status == JobStatus.CANCELLED and job.result is None
+    manager.shutdown(wait=True)
+
+
+def test_job_cancelled_after_its_worker_picked_it_up_is_finished(tmp_path):
+    manager = make_manager(tmp_path)
+    ran = []
+    manager.register("noop", "cpu")(lambda: ran.append(True))
+
+    # cancel() llegó cuando el worker ya había empezado y future.cancel() falló
+    job = Job(kind="noop", resource="cpu", cancel_requested=True)
+    manager._jobs[job.id] = job
+    manager._futures[job.id] = object()
+    manager._run(job.id)
+
+    assert ran == []
+    assert job.status == JobStatus.CANCELLED and job.finished_at is not None
+    assert job.id not in manager._futures
+    assert Job.model_validate_json((tmp_path / f"{job.id}.json").read_text()).status == JobStatus.CANCELLED
+    manager.shutdown(wait=True)
+
+
+def test_restore_requeues_queued_and_resumable_jobs_only(tmp_path):
+    queued = write_job(tmp_path, kind="render", status=JobStatus.QUEUED)
+    interrupted = write_job(tmp_path, kind="render", status=JobStatus.RUNNING, started_at=time.time())
+    resumable = write_job(tmp_path, kind="resume", status=JobStatus.RUNNING, started_at=time.time())
+    cancelled = write_job(tmp_path, kind="render", status=JobStatus.RUNNING, cancel_requested=True)
+
+    manager = make_manager(tmp_path)
+    ran = []
+    manager.register("render", "cpu")(lambda: ran.append("render"))
+    manager.register("resume", "cpu", resumable=True)(lambda: ran.append("resume"))
+    manager.restore()
+
+    assert wait_finished(manager, queued.id).status == JobStatus.COMPLETED
+    assert wait_finished(manager, resumable.id).status == JobStatus.COMPLETED
+    assert manager.get(interrupted.id).status == JobStatus.FAILED
+    assert "Interrupted" in manager.get(interrupted.id).error
+    assert manager.get(cancelled.id).status == JobStatus.CANCELLED
+    assert sorted(ran) == ["render", "resume"]
+    manager.shutdown(wait=True)
+
+
+def test_old_finished_jobs_are_pruned(tmp_path):
+    old = write_job(tmp_path, kind="render", status=JobStatus.COMPLETED, finished_at=time.time() - 7200)
+    recent = write_job(tmp_path, kind="render", status=JobStatus.FAILED, finished_at=time.time())
+
+    manager = make_manager(tmp_path, retention=3600)
+    manager.register("render", "cpu")(lambda: None)
+    manager.restore()
+
+    assert manager.get(old.id) is None and not (tmp_path / f"{old.id}.json").exists()
+    assert manager.get(recent.id) is not None and (tmp_path / f"{recent.id}.json").exists()
+    manager.shutdown(wait=True)
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+
+import pytest
+
+LLM = pytest.importorskip("generators.LLM")
+LLMCache, LLMResponse = LLM.LLMCache, LLM.LLMResponse
+
+
+def make_response(text: str = "hello", cost: float = 0.5) -> LLMResponse:
+    return LLMResponse(text=text, usage={"input_tokens": 1, "output_tokens": 1}, cost=cost)
+
+
+def test_key_depends_on_every_input():
+    base = dict(model_name="gpt", llm_config={"temperature": 0}, system_prompt="s", prompt="p", prefill=None)
+    key = LLMCache.make_key(**base)
+    assert key == LLMCache.make_key(**base)
+    for field, value in [("model_name", "claude"), ("llm_config", {"temperature": 1}), ("system_prompt", "t"),
+                         ("prompt", "q"), ("prefill", "{")]:
+        assert LLMCache.make_key(**{**base, field: value}) != key
+
+
+def test_hit_returns_zero_cost_and_tracks_savings(tmp_path):
+    cache = LLMCache(tmp_path)
+    assert cache.get("key") is None
+
+    cache.put("key", make_response(cost=0.5))
+    cached = cache.get("key")
+
+    assert cached.text == "hello"
+    assert cached.cached and cached.cost == 0 and cached.original_cost == 0.5
+    assert cache.stats() == {"hits": 1, "misses": 1, "saved_cost": 0.5}
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = LLMCache(tmp_path, ttl=60)
+    cache.put("key", make_response())
+    entry_file = tmp_path / "key.json"
+    entry = json.loads(entry_file.read_text(encoding='utf-8'))
+    entry_file.write_text(json.dumps({**entry, "created_at": time.time() - 120}), encoding='utf-8')
+
+    assert cache.get("key") is None
+    assert not entry_file.exists()
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = LLMCache(tmp_path, max_bytes=10**6)
+    for key in "abc":
+        cache.put(key, make_response("x" * 200))
+    entry_size = (tmp_path / "a.json").stat().st_size
+    for age, key in enumerate("abc"):
+        stamp = time.time() - 100 + age
+        os.utime(tmp_path / f"{key}.json", (stamp, stamp))
+    cache.get("a")  # "a" pasa a ser la más reciente
+
+    # Los tamaños varían en algún byte (created_at); el margen deja sitio para tres entradas y no para cuatro
+    cache._lru.max_bytes = 3 * entry_size + entry_size // 2
+    cache.put("d", make_response("x" * 200))
+
+    assert sorted(path.stem for path in tmp_path.glob("*.json")) == ["a", "c", "d"]
+
+
+def test_size_is_tracked_without_rescanning(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path)
+    cache.put("a", make_response())
+    cache.put("a", make_response("longer text"))  # reescribir una entrada no la cuenta dos veces
+
+    with monkeypatch.context() as patch:
+        patch.setattr(type(tmp_path), "glob", lambda *args: pytest.fail("put() scanned the cache directory"))
+        cache.put("b", make_response())
+
+    assert cache._lru.total_bytes == sum(path.stat().st_size for path in tmp_path.glob("*.json"))
+    assert LLMCache(tmp_path)._lru.total_bytes == cache._lru.total_bytes
@@ -0,0 +1,78 @@
+import gc
+import asyncio
+import weakref
+
+import pytest
+
+LLM_module = pytest.importorskip("generators.LLM")
+LLM, LLMCache, LLMResponse, ClientPool, Models = (
+    LLM_module.LLM, LLM_module.LLMCache, LLM_module.LLMResponse, LLM_module.ClientPool, LLM_module.Models
+)
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    monkeypatch.setattr(ClientPool, "_clients", {})
+    monkeypatch.setattr(ClientPool, "_async_clients", weakref.WeakKeyDictionary())
+
+
+class FakeLLM(LLM):
+    def __init__(self, model, **kwargs):
+        super().__init__(model, **kwargs)
+        self.calls = []
+
+    def _generate_text(self, prompt, system_prompt=None, prefill=None):
+        self.calls.append(prompt)
+        return LLMResponse(text=prompt.upper(), usage=1, cost=0.1)
+
+    async def _agenerate_text(self, prompt, system_prompt=None, prefill=None):
+        self.calls.append(prompt)
+        await asyncio.sleep(0)
+        return LLMResponse(text=prompt.upper(), usage=1, cost=0.1)
+
+
+def test_sync_clients_are_shared_per_provider_and_api_key():
+    client = ClientPool.get("openai", "key", object)
+
+    assert ClientPool.get("openai", "key", lambda: pytest.fail("client created twice")) is client
+    assert ClientPool.get("openai", "other key", object) is not client
+    assert ClientPool.get("anthropic", "key", object) is not client
+
+
+def test_async_clients_are_shared_within_an_event_loop_only():
+    async def get_twice():
+        first = ClientPool.get_async("openai", "key", object)
+        assert ClientPool.get_async("openai", "key", lambda: pytest.fail("client created twice")) is first
+        return first
+
+    assert asyncio.run(get_twice()) is not asyncio.run(get_twice())
+
+
+def test_async_clients_are_dropped_with_their_event_loop():
+    loop = asyncio.new_event_loop()
+
+    async def get():
+        return ClientPool.get_async("openai", "key", object)
+
+    loop.run_until_complete(get())
+    assert len(ClientPool._async_clients) == 1
+
+    loop.close()
+    del loop
+    gc.collect()
+
+    assert len(ClientPool._async_clients) == 0
+
+
+def test_agenerate_text_runs_concurrently_and_uses_the_cache(tmp_path):
+    llm = FakeLLM(Models.OpenAI.GPT4oMini, cache=LLMCache(tmp_path))
+
+    async def generate():
+        return await asyncio.gather(*(llm.agenerate_text(prompt) for prompt in ["a", "b", "c"]))
+
+    first = asyncio.run(generate())
+    second = asyncio.run(generate())
+
+    assert [response.text for response in first] == ["A", "B", "C"]
+    assert sorted(llm.calls) == ["a", "b", "c"]
+    assert all(response.cached and response.cost == 0 for response in second)
@@ -0,0 +1,88 @@
+import pytest
+
+serie_productor = pytest.importorskip("serie_productor")
+from data_types import SerieData, VideoData, Storyboard, Scene, StoryCheckpoint
+
+ShortsSerieGenerator = serie_productor.ShortsSerieGenerator
+
+
+class FakeWriter:
+    def __init__(self):
+        self.calls = []
+
+    def generate_theme(self, expertise, serie_theme, used_themes):
+        self.calls.append("theme")
+        return {"text": f"theme {len(used_themes)}", "cost": 0.1}
+
+    def generate_story(self, expertise, theme):
+        self.calls.append("story")
+        return {"text": f"draft of {theme}", "cost": 0.1}
+
+    def improve_story(self, expertise, draft):
+        self.calls.append("improve")
+        return {"text": f"improved {draft}", "cost": 0.1}
+
+    def evaluate_text(self, text):
+        self.calls.append("evaluate")
+        return {"average_score": 5.0, "cost": 0.1}
+
+
+class FakeStoryboarder:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_storyboard(self, text):
+        self.calls += 1
+        return Storyboard(scenes=[Scene(text=text, image="image")])
+
+
+def make_generator(serie_data: SerieData) -> ShortsSerieGenerator:
+    generator = ShortsSerieGenerator(llm=None, serie_data=serie_data)
+    generator.writer, generator.storyboarder = FakeWriter(), FakeStoryboarder()
+    return generator
+
+
+def make_serie(tmp_path, num_stories=2) -> SerieData:
+    return SerieData(json_data_path=tmp_path / "data.json", serie_path=tmp_path, name="Serie",
+                     expertise="history", serie_theme="myths", num_stories=num_stories)
+
+
+def test_generate_serie_resumes_from_checkpoints(tmp_path):
+    generator = make_generator(make_serie(tmp_path))
+    StoryCheckpoint(
+        theme="done", draft="d", improved_text="finished text", text_evaluation={"average_score": 9.0},
+        storyboard=Storyboard(scenes=[Scene(text="finished text", image="image")]), text_cost=1.0,
+    ).save(generator._checkpoint_path(0))
+    StoryCheckpoint(theme="half", draft="half draft", text_cost=0.2).save(generator._checkpoint_path(1))
+
+    serie = generator.generate_serie()
+
+    # Solo faltaban la mejora, la evaluación y el storyboard de la segunda historia
+    assert generator.writer.calls == ["improve", "evaluate"]
+    assert generator.storyboarder.calls == 1
+    assert [video.youtube_details.title for video in serie.videos] == ["done", "half"]
+    assert [video.video_n for video in serie.videos] == [1, 2]
+    assert serie.videos[1].text_cost == pytest.approx(0.4)
+    assert not generator.checkpoints_path.exists()
+    assert VideoData.get(tmp_path / "2" / "video_data.json").text == "improved half draft"
+
+
+def test_resume_of_a_completed_serie_does_nothing(tmp_path, monkeypatch):
+    make_generator(make_serie(tmp_path)).generate_serie()
+    monkeypatch.setattr(ShortsSerieGenerator, "generate_serie", lambda *args, **kwargs: pytest.fail("serie regenerated"))
+
+    serie = ShortsSerieGenerator.resume(llm=None, json_data_path=tmp_path / "data.json")
+
+    assert len(serie.videos) == 2
+
+
+def test_resume_of_an_interrupted_serie_continues(tmp_path, monkeypatch):
+    generator = make_generator(make_serie(tmp_path))
+    generator.serie_data.save()
+    StoryCheckpoint(theme="half").save(generator._checkpoint_path(0))
+    resumed = []
+    monkeypatch.setattr(ShortsSerieGenerator, "generate_serie", lambda self, max_workers=1: resumed.append(self.serie_data.name))
+
+    ShortsSerieGenerator.resume(llm=None, json_data_path=tmp_path / "data.json")
+
+    assert resumed == ["Serie"]
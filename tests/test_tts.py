@@ -0,0 +1,110 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+TTS_module = pytest.importorskip("generators.TTS")
+TTS, TTSCache, TTSModels = TTS_module.TTS, TTS_module.TTSCache, TTS_module.TTSModels
+
+
+def http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"Error: {status_code}", response=response)
+
+
+class FakeTTS(TTS):
+    """Writes the text as the "audio", failing first with the queued errors."""
+    errors: list = []
+    calls: list = []
+
+    @staticmethod
+    def generate_speech(text: str, output_file: Path, model: TTSModels = TTSModels.GOOGLE, voice=None) -> Path:
+        FakeTTS.calls.append(text)
+        if FakeTTS.errors:
+            raise FakeTTS.errors.pop(0)
+        output_file.write_text(text, encoding='utf-8')
+        return output_file
+
+
+@pytest.fixture(autouse=True)
+def reset_fake():
+    FakeTTS.errors, FakeTTS.calls = [], []
+
+
+def test_batch_writes_one_file_per_text_in_order(tmp_path):
+    paths = FakeTTS.generate_speech_batch(["a", "b", "c"], tmp_path, max_workers=3)
+
+    assert paths == [tmp_path / f"{i}.mp3" for i in range(3)]
+    assert [path.read_text() for path in paths] == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("error", [http_error(429), http_error(503), requests.ConnectionError("reset")])
+def test_transient_errors_are_retried(tmp_path, error):
+    FakeTTS.errors = [error]
+
+    FakeTTS.generate_speech_batch(["a"], tmp_path, backoff=0)
+
+    assert FakeTTS.calls == ["a", "a"]
+
+
+@pytest.mark.parametrize("error", [http_error(401), http_error(404), ValueError("bad voice")])
+def test_other_errors_fail_without_retrying(tmp_path, error):
+    FakeTTS.errors = [error]
+
+    with pytest.raises(Exception, match="scene 0"):
+        FakeTTS.generate_speech_batch(["a"], tmp_path, backoff=0)
+    assert FakeTTS.calls == ["a"]
+
+
+def test_gives_up_after_the_retries(tmp_path):
+    FakeTTS.errors = [http_error(500)] * 3
+
+    with pytest.raises(Exception, match="scene 0"):
+        FakeTTS.generate_speech_batch(["a"], tmp_path, retries=2, backoff=0)
+    assert len(FakeTTS.calls) == 3
+
+
+def test_cache_key_normalizes_text_and_depends_on_voice():
+    key = TTSCache.make_key("Fake", TTSModels.GOOGLE, "es", None, "Hola  mundo\n")
+
+    assert key == TTSCache.make_key("Fake", TTSModels.GOOGLE, "es", None, "Hola mundo")
+    assert key != TTSCache.make_key("Fake", TTSModels.GOOGLE, "en", None, "Hola mundo")
+    assert key != TTSCache.make_key("Fake", TTSModels.GOOGLE, "es", {"stability": 1}, "Hola mundo")
+
+
+def test_batch_reuses_cached_audio(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    FakeTTS.generate_speech_batch(["a", "b"], tmp_path / "first", cache=cache)
+
+    paths = FakeTTS.generate_speech_batch(["a", "changed"], tmp_path / "second", cache=cache)
+
+    assert sorted(FakeTTS.calls) == ["a", "b", "changed"]
+    assert [path.read_text() for path in paths] == ["a", "changed"]
+    assert cache.hits == 1
+
+
+def test_regenerating_a_linked_output_keeps_the_cache_entry(tmp_path):
+    cache = TTSCache(tmp_path / "cache")
+    FakeTTS.generate_speech_batch(["a"], tmp_path / "out", cache=cache)
+    FakeTTS.generate_speech_batch(["a"], tmp_path / "out", cache=cache)  # la salida es ahora un enlace a la caché
+
+    FakeTTS.generate_speech_batch(["b"], tmp_path / "out", cache=cache)
+
+    assert (tmp_path / "out" / "0.mp3").read_text() == "b"
+    assert FakeTTS.generate_speech_batch(["a"], tmp_path / "again", cache=cache)[0].read_text() == "a"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(tmp_path / "cache", max_bytes=10)
+    audio = tmp_path / "audio.mp3"
+    for key in "abc":
+        audio.write_bytes(b"12345")
+        cache.put(key, audio)
+        stamp = time.time() - 100 + "abc".index(key)
+        os.utime(tmp_path / "cache" / f"{key}.mp3", (stamp, stamp))
+
+    assert sorted(path.stem for path in (tmp_path / "cache").glob("*.mp3")) == ["b", "c"]
+    assert cache.materialize("c", tmp_path / "out.mp3") and not cache.materialize("a", tmp_path / "out.mp3")
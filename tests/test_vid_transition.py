@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+vid_transition = pytest.importorskip("tools.vid_transition")
+AnimationImages, Animations = vid_transition.AnimationImages, vid_transition.Animations
+
+NUM_FRAMES = 6
+
+
+def gradient_frame(height: int = 96, width: int = 64, offset: int = 0) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 4 + offset, y * 2, (x + y) * 2], axis=-1).astype(np.uint8)
+
+
+def phase_actions(animation: str):
+    return vid_transition._transition_actions(
+        animation, NUM_FRAMES, vid_transition.MAX_ROTATION, vid_transition.MAX_DISTORTION, vid_transition.MAX_BLUR,
+        vid_transition.MAX_BRIGHTNESS, vid_transition.MAX_ZOOM,
+    )
+
+
+@pytest.mark.parametrize("animation", [animation.name for animation in Animations])
+def test_fused_geometry_matches_the_per_action_transforms(animation):
+    image = Image.fromarray(gradient_frame())
+    for actions in phase_actions(animation):
+        for img_idx in range(NUM_FRAMES):
+            fused = np.asarray(AnimationImages.transform_image(image, actions, img_idx, fused=True), dtype=float)
+            stepwise = np.asarray(AnimationImages.transform_image(image, actions, img_idx, fused=False), dtype=float)
+
+            assert fused.shape == stepwise.shape
+            # Solo cambia el remuestreo: un único paso en lugar de uno por acción
+            assert np.abs(fused - stepwise).mean() < 2
+
+
+def test_parallel_transitions_match_the_serial_ones():
+    frame_pairs = [
+        ([gradient_frame(offset=i) for i in range(NUM_FRAMES)], [gradient_frame(offset=50 + i) for i in range(NUM_FRAMES)]),
+        ([gradient_frame(offset=i) for i in range(NUM_FRAMES)], [gradient_frame(offset=90 + i) for i in range(2 * NUM_FRAMES)]),
+    ]
+    animations = ["rotation", "long_translation"]
+
+    parallel = vid_transition.transitions_frames(frame_pairs, animations, max_workers=2)
+    serial = vid_transition.transitions_frames(frame_pairs, animations, max_workers=1)
+
+    assert len(parallel) == len(serial) == 2
+    for parallel_phases, serial_phases in zip(parallel, serial):
+        for parallel_frames, serial_frames in zip(parallel_phases, serial_phases):
+            assert len(parallel_frames) == len(serial_frames)
+            for parallel_frame, serial_frame in zip(parallel_frames, serial_frames):
+                np.testing.assert_array_equal(parallel_frame, serial_frame)
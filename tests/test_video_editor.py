@@ -0,0 +1,354 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+video_editor = pytest.importorskip("tools.video_editor")
+VideoEditor, VideoEffects = video_editor.VideoEditor, video_editor.VideoEffects
+
+
+class FakeEstimator:
+    def __init__(self):
+        self.calls = 0
+
+    def estimate(self, image):
+        self.calls += 1
+        return np.linspace(0, 1, image.width * image.height, dtype=np.float32).reshape(image.height, image.width)
+
+
+@pytest.fixture
+def estimator(monkeypatch):
+    fake = FakeEstimator()
+    monkeypatch.setattr(VideoEditor, "_get_depth_estimator", staticmethod(lambda: fake))
+    return fake
+
+
+def write_image(path, color=(200, 100, 50), size=(32, 48)):
+    Image.new("RGB", size, color).save(path)
+    return path
+
+
+def test_depth_maps_are_cached_by_image_content(tmp_path, estimator):
+    image_path = write_image(tmp_path / "a.png")
+
+    first = VideoEditor._estimate_depth(image_path, Image.open(image_path), cache_path=tmp_path / "depth")
+    second = VideoEditor._estimate_depth(image_path, Image.open(image_path), cache_path=tmp_path / "depth")
+
+    assert estimator.calls == 1
+    assert first.dtype == second.dtype == np.float32
+    np.testing.assert_array_equal(first, second)  # fallo y acierto devuelven la misma copia float16
+
+    other_path = write_image(tmp_path / "b.png", color=(0, 0, 0))
+    VideoEditor._estimate_depth(other_path, Image.open(other_path), cache_path=tmp_path / "depth")
+    assert estimator.calls == 2
+
+
+def test_cache_hits_do_not_load_the_estimator(tmp_path, monkeypatch, estimator):
+    image_path = write_image(tmp_path / "a.png")
+    VideoEditor._estimate_depth(image_path, Image.open(image_path), cache_path=tmp_path / "depth")
+    monkeypatch.setattr(VideoEditor, "_get_depth_estimator", staticmethod(lambda: pytest.fail("estimator loaded")))
+
+    VideoEditor._estimate_depth(image_path, Image.open(image_path), cache_path=tmp_path / "depth")
+
+
+def test_shake_trajectory_is_reproducible_from_its_seed():
+    trajectory = VideoEffects.shake_trajectory(120, noise_level=20, inertia=0.9, seed=7)
+
+    assert trajectory.shape == (120, 2) and trajectory.dtype.kind == "i"
+    np.testing.assert_array_equal(trajectory, VideoEffects.shake_trajectory(120, noise_level=20, inertia=0.9, seed=7))
+    assert not np.array_equal(trajectory, VideoEffects.shake_trajectory(120, noise_level=20, inertia=0.9, seed=8))
+    assert np.abs(trajectory).max() <= 20
+
+
+def test_positional_noise_does_not_depend_on_frame_order():
+    x, y = np.meshgrid(np.arange(64), np.arange(48))
+    frame = np.stack([x, y, x + y], axis=-1).astype(np.uint8)
+    clip = video_editor.mp.ImageClip(frame).set_duration(2).set_fps(10)
+    noisy = VideoEffects.add_positional_noise(clip, noise_level=30, inertia=0.5, seed=3)
+    times = [i / 10 for i in range(20)]
+
+    forward = [noisy.get_frame(t) for t in times]
+    backward = [noisy.get_frame(t) for t in reversed(times)][::-1]
+
+    for a, b in zip(forward, backward):
+        assert a.shape == frame.shape
+        np.testing.assert_array_equal(a, b)
+    assert any(not np.array_equal(a, frame) for a in forward)
+
+
+class IncrementalRender:
+    """Runs `_generate_depth_video_incremental` recording which scenes and segments it rebuilds."""
+    def __init__(self, tmp_path, monkeypatch, n_scenes=3):
+        self.tmp_path = tmp_path
+        self.images = [write_image(tmp_path / f"{n}.png", color=(n * 60, 0, 0)) for n in range(n_scenes)]
+        self.audios_path = tmp_path / "audios"
+        self.audios_path.mkdir()
+        for n in range(n_scenes):
+            (self.audios_path / f"{n}.mp3").write_bytes(b"audio %d" % n)
+        self.depth_renders, self.dirty_segments = [], []
+        self.scene_duration = 1.0
+
+        monkeypatch.setattr(VideoEditor, "get_audio_and_duration", staticmethod(lambda n, audios_path: (None, self.scene_duration)))
+        monkeypatch.setattr(VideoEditor, "_generate_depth_effect", staticmethod(self._generate_depth_effect))
+        monkeypatch.setattr(VideoEditor, "_render_segmented", staticmethod(self._render_segmented))
+        monkeypatch.setattr(VideoEditor, "_finish_segmented", staticmethod(lambda *args, **kwargs: None))
+        monkeypatch.setattr(video_editor.vid_transition, "transitions_frames", lambda frame_pairs, animations, **kwargs: list(frame_pairs))
+
+    def _generate_depth_effect(self, input_image_path, output_video_path, duration=5, fps=30, params=None):
+        self.depth_renders.append(self.images.index(Path(input_image_path)))
+        with video_editor.FFmpegWriter(output_video_path, (32, 48), fps, profile="preview") as writer:
+            for _ in range(int(duration * fps)):
+                writer.write_frame(np.zeros((48, 32, 3), np.uint8))
+        return output_video_path
+
+    def _render_segmented(self, specs, transitions, fps, segments_path, max_workers=None, profile="default"):
+        self.segments_profile = profile
+        self.dirty_segments.append([n for n, spec in enumerate(specs) if spec["dirty"]])
+        for n, spec in enumerate(specs):
+            if spec["dirty"]:
+                (segments_path / f"{n}_segment.mp4").write_bytes(b"segment")
+        return segments_path / "segments.mp4", [1.0] * len(specs)
+
+    def run(self):
+        self.depth_renders = []
+        VideoEditor._generate_depth_video_incremental(
+            self.images, self.audios_path, fps=10, transition_n_frames=2, background_music_path=None,
+            segments_path=self.tmp_path / "segments", output_path=self.tmp_path / "video.mp4",
+        )
+
+
+def test_incremental_render_only_rebuilds_what_changed(tmp_path, monkeypatch):
+    render = IncrementalRender(tmp_path, monkeypatch)
+
+    render.run()
+    assert render.depth_renders == [0, 1, 2] and render.dirty_segments[-1] == [0, 1, 2]
+
+    render.run()
+    assert render.depth_renders == [] and render.dirty_segments[-1] == []
+
+    # Cambiar la imagen 1 rehace su escena, su segmento y el anterior, cuya transición usa sus primeros fotogramas
+    write_image(render.images[1], color=(0, 255, 0))
+    render.run()
+    assert render.depth_renders == [1] and render.dirty_segments[-1] == [0, 1]
+
+
+def test_incremental_render_keeps_transition_seeds(tmp_path, monkeypatch):
+    render = IncrementalRender(tmp_path, monkeypatch)
+    render.run()
+    manifest_path = tmp_path / "segments" / "manifest.json"
+    seeds = [segment["seed"] for segment in json.loads(manifest_path.read_text())["segments"]]
+
+    (render.audios_path / "2.mp3").write_bytes(b"new audio")
+    render.run()
+
+    assert [segment["seed"] for segment in json.loads(manifest_path.read_text())["segments"]] == seeds
+    assert render.depth_renders == [2] and render.dirty_segments[-1] == [1, 2]
+
+
+def test_ffmpeg_writer_encodes_frames_and_audio(tmp_path):
+    output_path = tmp_path / "out.mp4"
+    audio = np.zeros((44100, 2), np.int16)
+
+    with video_editor.FFmpegWriter(output_path, (32, 48), 10, profile="preview", audio=audio) as writer:
+        for _ in range(10):
+            writer.write_frame(np.zeros((48, 32, 3), np.uint8))
+
+    clip = video_editor.mp.VideoFileClip(str(output_path))
+    assert clip.size == [32, 48] and clip.audio is not None
+    clip.close()
+
+
+def test_ffmpeg_writer_propagates_the_original_error(tmp_path):
+    output_path = tmp_path / "out.mp4"
+
+    with pytest.raises(ValueError, match="render failed"):
+        with video_editor.FFmpegWriter(output_path, (32, 48), 10, profile="preview", audio=np.zeros((44100, 2), np.int16)) as writer:
+            writer.write_frame(np.zeros((48, 32, 3), np.uint8))
+            raise ValueError("render failed")
+
+    assert not output_path.exists()
+
+
+def test_ffmpeg_writer_rejects_unknown_profiles(tmp_path):
+    with pytest.raises(ValueError):
+        video_editor.FFmpegWriter(tmp_path / "out.mp4", (32, 48), 10, profile="draft")
+
+
+def test_ffmpeg_writer_reports_ffmpeg_errors_when_it_stops_reading(tmp_path):
+    output_path = tmp_path / "missing" / "out.mp4"
+
+    with pytest.raises(IOError, match="No such file or directory"):
+        with video_editor.FFmpegWriter(output_path, (32, 48), 10, profile="preview") as writer:
+            for _ in range(1000):
+                writer.write_frame(np.zeros((48, 32, 3), np.uint8))
+
+
+@pytest.mark.parametrize("nchannels", [1, 2])
+def test_write_video_accepts_mono_and_stereo_audio(tmp_path, nchannels):
+    output_path = tmp_path / "out.mp4"
+    make_frame = (lambda t: np.sin(440 * 2 * np.pi * t)) if nchannels == 1 else (lambda t: np.array([np.sin(440 * 2 * np.pi * t)] * 2).T)
+    audio = video_editor.mp.AudioClip(make_frame, duration=1, fps=44100)
+    assert audio.nchannels == nchannels
+    video = video_editor.mp.ColorClip((32, 48), color=(0, 0, 0), duration=1).set_fps(10).set_audio(audio)
+
+    video_editor.VideoEditor.write_video(video, output_path, profile="preview")
+
+    clip = video_editor.mp.VideoFileClip(str(output_path))
+    assert clip.audio is not None and clip.duration == pytest.approx(1, abs=0.1)
+    clip.close()
+
+
+def test_ffmpeg_writer_defaults_to_the_baseline_encoder_settings(tmp_path):
+    with video_editor.FFmpegWriter(tmp_path / "out.mp4", (32, 48), 10) as writer:
+        writer.write_frame(np.zeros((48, 32, 3), np.uint8))
+
+    assert writer.settings["preset"] == "medium" and writer.settings["crf"] == 23
+
+
+def write_clip(path, n_frames, fps=10, value=0):
+    with video_editor.FFmpegWriter(path, (32, 48), fps, profile="preview") as writer:
+        for _ in range(n_frames):
+            writer.write_frame(np.full((48, 32, 3), value, np.uint8))
+    return path
+
+
+def tone(duration):
+    return video_editor.mp.AudioClip(lambda t: np.array([np.sin(440 * 2 * np.pi * t)] * 2).T, duration=duration, fps=44100)
+
+
+def test_render_segmented_encodes_and_joins_the_segments(tmp_path):
+    sources = [write_clip(tmp_path / f"{n}_depth.mp4", 10, value=n * 100) for n in range(2)]
+    specs = [{"kind": "video", "source": str(source)} for source in sources]
+    transition = ([np.zeros((48, 32, 3), np.uint8)] * 2, [np.zeros((48, 32, 3), np.uint8)] * 2)
+
+    concat_path, durations = VideoEditor._render_segmented(specs, [transition, None], 10, tmp_path, max_workers=2, profile="preview")
+
+    assert durations == pytest.approx([1.4, 1.0], abs=0.05)
+    clip = video_editor.mp.VideoFileClip(str(concat_path))
+    assert clip.duration == pytest.approx(2.4, abs=0.1)
+    clip.close()
+    assert not list(tmp_path.glob("*.npz")) and not list(tmp_path.glob("*.tmp.mp4"))
+
+
+def test_finish_segmented_copies_the_video_stream_and_removes_the_audio_file(tmp_path, monkeypatch):
+    concat_path = write_clip(tmp_path / "segments.mp4", 20)
+    monkeypatch.setattr(VideoEditor, "write_video", staticmethod(lambda *args, **kwargs: pytest.fail("video re-encoded")))
+
+    VideoEditor._finish_segmented(concat_path, [1.0, 1.0], [tone(1.0), tone(1.0)], tmp_path / "video.mp4")
+
+    clip = video_editor.mp.VideoFileClip(str(tmp_path / "video.mp4"))
+    assert clip.audio is not None and clip.duration == pytest.approx(2.0, abs=0.1)
+    clip.close()
+    assert not (tmp_path / "segments.m4a").exists()
+
+
+@pytest.mark.parametrize("kwargs", [dict(noise=True), dict(segments_profile="intermediate")])
+def test_finish_segmented_encodes_once_with_the_final_profile(tmp_path, monkeypatch, kwargs):
+    concat_path = write_clip(tmp_path / "segments.mp4", 10)
+    profiles = []
+    monkeypatch.setattr(VideoEditor, "write_video", staticmethod(lambda video, output_path, profile="default": profiles.append(profile)))
+
+    VideoEditor._finish_segmented(concat_path, [1.0], [tone(1.0)], tmp_path / "video.mp4", profile="publish", **kwargs)
+
+    assert profiles == ["publish"]
+
+
+def test_incremental_render_encodes_segments_losslessly_when_the_video_will_be_sped_up(tmp_path, monkeypatch):
+    render = IncrementalRender(tmp_path, monkeypatch)
+    render.run()
+    assert render.segments_profile == "default"
+
+    render.scene_duration = 20.0
+    render.run()
+    assert render.segments_profile == "intermediate"
+
+
+def test_face_centers_are_cached_in_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(VideoEffects, "_face_centers", video_editor.OrderedDict())
+    monkeypatch.setattr(VideoEffects, "FACE_CENTERS_CACHE_SIZE", 2)
+    frames = [np.full((40, 60, 3), value, np.uint8) for value in range(3)]
+
+    VideoEffects._face_center(frames[0])
+    VideoEffects._face_center(frames[1])
+    VideoEffects._face_center(frames[0])  # el primero pasa a ser el más reciente
+    assert VideoEffects._face_center(frames[2]) == (30, 20)
+
+    assert list(VideoEffects._face_centers) == [video_editor.hashlib.sha256(frames[n].tobytes()).hexdigest() for n in (0, 2)]
+
+
+class FakeDepthScene:
+    """Stands in for DepthFlow: writes the image at the requested size, fps and duration."""
+    renders = []
+
+    def __init__(self, backend=None):
+        self.aspect_ratio = None
+
+    def input(self, image, depth):
+        self.image = image
+
+    def add_animation(self, animation):
+        pass
+
+    def main(self, width, height, ssaa, fps, time, output, **kwargs):
+        FakeDepthScene.renders.append(dict(size=(width, height), ssaa=ssaa, fps=fps))
+        frame = np.asarray(self.image.convert("RGB").resize((width, height)))
+        with video_editor.FFmpegWriter(output, (width, height), fps, profile="preview") as writer:
+            for _ in range(round(time * fps)):
+                writer.write_frame(frame)
+        return [output]
+
+
+@pytest.fixture
+def video_assets(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_editor, "DepthScene", FakeDepthScene)
+    monkeypatch.setattr(video_editor, "Presets", type("Presets", (), {"Dolly": staticmethod(lambda **kwargs: kwargs)}))
+    monkeypatch.setattr(VideoEditor, "_estimate_depth", staticmethod(lambda input_image_path, image: np.zeros(image.size[::-1], np.float32)))
+    monkeypatch.setattr(FakeDepthScene, "renders", [])
+
+    video_path = tmp_path / "1"
+    (video_path / "images").mkdir(parents=True)
+    (video_path / "audios").mkdir()
+    for n in range(2):
+        write_image(video_path / "images" / f"{n}.png", color=(n * 200, 50, 50), size=(64, 96))
+        tone(1.2).write_audiofile(str(video_path / "audios" / f"{n}.mp3"), fps=44100, logger=None)
+    return video_path
+
+
+def render_video(video_path, preview):
+    output_path = video_path / ("1_preview.mp4" if preview else "1.mp4")
+    VideoEditor.generate_depth_video(
+        fps=20, images_path=video_path / "images", audios_path=video_path / "audios",
+        transitions_path=video_path.parent / "transitions", output_path=output_path,
+        transition_workers=1, segmented=True, segment_workers=1, preview=preview,
+    )
+    return output_path
+
+
+def test_preview_renders_at_half_resolution_and_framerate(video_assets):
+    output_path = render_video(video_assets, preview=True)
+
+    assert {(render["size"], render["ssaa"], render["fps"]) for render in FakeDepthScene.renders} == {((32, 48), 1.0, 10)}
+    clip = video_editor.mp.VideoFileClip(str(output_path))
+    assert clip.size == [32, 48] and clip.fps == 10 and clip.audio is not None
+    clip.close()
+
+
+def test_preview_keeps_its_segments_apart_from_the_publish_render(video_assets):
+    render_video(video_assets, preview=False)
+    assert {render["size"] for render in FakeDepthScene.renders} == {(64, 96)}
+    publish_files = {path: path.read_bytes() for path in (video_assets / "segments").iterdir()}
+    published = (video_assets / "1.mp4").read_bytes()
+
+    output_path = render_video(video_assets, preview=True)
+
+    assert output_path.name == "1_preview.mp4" and output_path.exists()
+    assert (video_assets / "segments_preview" / "manifest.json").exists()
+    assert {path: path.read_bytes() for path in (video_assets / "segments").iterdir()} == publish_files
+    assert (video_assets / "1.mp4").read_bytes() == published
+
+    # Volver a publicar reutiliza todos los segmentos: la previsualización no invalidó el manifiesto
+    FakeDepthScene.renders.clear()
+    render_video(video_assets, preview=False)
+    assert FakeDepthScene.renders == []
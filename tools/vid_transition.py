@@ -8,7 +8,13 @@ import shutil
 import subprocess
 import argparse
 import tempfile
-from PIL import Image, ImageOps, ImageEnhance, ImageFilter
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
 from moviepy.editor import VideoFileClip
 
 # default variables used in arg-parser
@@ -488,7 +494,9 @@ class AnimationImages:
                     *self.transform(x1, y0))
 
         def determine_parameters(self, img):
-            width, height = img.size
+            self.determine_size_parameters(*img.size)
+
+        def determine_size_parameters(self, width, height):
             self.half_width = width / 2
             self.half_height = height / 2
             self.correction_radius = (min(self.half_width, self.half_height) * 10) * (1 - self.strength) ** 2 + 1
@@ -516,6 +524,32 @@ class AnimationImages:
             msg += [""]
             return msg
 
+        def get_remap_grids(self, size):
+            return AnimationImages.PincushionDeformation._remap_grids(size[0], size[1], self.strength,
+                                                                      self.zoom, self.auto_zoom)
+
+        @staticmethod
+        @functools.lru_cache(maxsize=16)
+        def _remap_grids(width, height, strength, zoom, auto_zoom):
+            """Vectorized `transform` over every pixel centre, as x/y sampling maps for cv2.remap.
+
+            Cached per (size, strength), so each distortion level is computed once and shared by every
+            frame and transition of the same resolution.
+            """
+            deformation = AnimationImages.PincushionDeformation(strength, zoom, auto_zoom)
+            deformation.determine_size_parameters(width, height)
+            new_x, new_y = np.meshgrid(np.arange(width, dtype=np.float64) + 0.5 - deformation.half_width,
+                                       np.arange(height, dtype=np.float64) + 0.5 - deformation.half_height)
+            r = np.hypot(new_x, new_y) / deformation.correction_radius
+            theta = np.ones_like(r)
+            np.divide(np.arctan(r), r, out=theta, where=r != 0)
+            # cv2.remap samples at pixel centres, PIL coordinates are pixel corners
+            map_x = (deformation.half_width + theta * new_x * deformation.zoom - 0.5).astype(np.float32)
+            map_y = (deformation.half_height + theta * new_y * deformation.zoom - 0.5).astype(np.float32)
+            map_x.setflags(write=False)
+            map_y.setflags(write=False)
+            return map_x, map_y
+
         def getmesh(self, img):
             self.determine_parameters(img)
             width, height = img.size
@@ -566,24 +600,11 @@ class AnimationImages:
                         msg += f" - action [{action.action_type.name} => {value:g}]"
                     msg += f" - folder [{img_save_folder.name}]"
                     log_debug(msg)
-                    if action.action_type == FramesActions.Type.mirror:
-                        img = AnimationImages.mirror_image_effect(img, value)
-                    elif action.action_type == FramesActions.Type.zoom:
-                        img = AnimationImages.zoom_effect(img, value)
-                    elif action.action_type == FramesActions.Type.crop:
-                        img = AnimationImages.crop_effect(img, value, original_size)
-                    elif action.action_type == FramesActions.Type.rotation:
-                        img = AnimationImages.rotation_effect(img, value)
-                    elif action.action_type == FramesActions.Type.blur:
-                        img = AnimationImages.blur_effect(img, value)
-                    elif action.action_type == FramesActions.Type.distortion:
-                        img = AnimationImages.distortion_effect(img, value)
-                        if value > peak_distortion_value:
-                            peak_distortion_msg = AnimationImages.PincushionDeformation(value, 1.0).get_debug_info(img)
-                            peak_distortion_value = value
-                            peak_distortion_img = img_path
-                    elif action.action_type == FramesActions.Type.brightness:
-                        img = AnimationImages.brightness_effect(img, value)
+                    img = AnimationImages.apply_action(img, action.action_type, value, original_size)
+                    if action.action_type == FramesActions.Type.distortion and value > peak_distortion_value:
+                        peak_distortion_msg = AnimationImages.PincushionDeformation(value, 1.0).get_debug_info(img)
+                        peak_distortion_value = value
+                        peak_distortion_img = img_path
                     if debug or action_idx == len(actions) - 1:
                         img.save(str(img_save_folder / img_path.name))
 
@@ -595,31 +616,136 @@ class AnimationImages:
         return res_folder
 
     @staticmethod
-    def mirror_image_effect(in_img, mirror_direction):
-        images = [in_img, in_img.transpose(0), in_img.transpose(1),
-                  in_img.transpose(0).transpose(1)]
-        w, h = in_img.width, in_img.height
+    def transform_images(in_images, in_actions, fused=True):
+        """In-memory counterpart of make_transition: applies the phase actions to a list of PIL images.
+
+        With `fused`, the leading geometric actions are resolved by `apply_geometry` in one sampling pass
+        and only the remaining (photometric) actions run one by one.
+        """
+        return [AnimationImages.transform_image(img, in_actions, img_idx, fused)
+                for img_idx, img in enumerate(in_images)]
+
+    @staticmethod
+    def transform_image(in_img, in_actions, img_idx, fused=True):
+        """Applies the actions of frame `img_idx` to a single image, so frames can be processed independently."""
+        original_size = in_img.size
+        actions = in_actions
+        if fused:
+            in_img, actions = AnimationImages.apply_geometry(in_img, in_actions, img_idx)
+        for action in actions:
+            in_img = AnimationImages.apply_action(in_img, action.action_type, action.values[img_idx], original_size)
+        return in_img
+
+    @staticmethod
+    def apply_geometry(in_img, in_actions, img_idx):
+        """Composes the leading mirror/zoom/crop/rotation actions into a single cv2.remap.
+
+        Zoom, crop and rotation are affine, so they are folded into one matrix mapping output pixels to
+        coordinates on the (virtual) mirror canvas; the mirror tiling is then resolved per pixel by folding
+        those coordinates back into the source image. The tiled canvas is never allocated. Returns the
+        transformed image and the actions left to apply.
+        """
+        w, h = in_img.size
+        size = (w, h)
+        layout = None
+        matrix = np.eye(3)
+        num_geometric = 0
+        for action in in_actions:
+            value = action.values[img_idx]
+            if action.action_type == FramesActions.Type.mirror and num_geometric == 0:
+                mirror_layout = AnimationImages._mirror_layout(value)
+                if mirror_layout is not None:
+                    layout = np.array(mirror_layout)
+                    size = (w * layout.shape[1], h * layout.shape[0])
+            elif action.action_type == FramesActions.Type.zoom:
+                # same integer box as zoom_effect's crop, scaled back to the current size
+                cw, ch = size
+                zoom2 = value * 2
+                x0, y0 = round(cw / 2 - cw / zoom2), round(ch / 2 - ch / zoom2)
+                x1, y1 = round(cw / 2 + cw / zoom2), round(ch / 2 + ch / zoom2)
+                matrix = matrix @ np.array([[(x1 - x0) / cw, 0, x0], [0, (y1 - y0) / ch, y0], [0, 0, 1]])
+            elif action.action_type == FramesActions.Type.crop:
+                tfc_x, tfc_y = int(round(value[0] * w, 0)), int(round(value[1] * h, 0))
+                matrix = matrix @ np.array([[1, 0, tfc_x], [0, 1, tfc_y], [0, 0, 1]])
+                size = (w, h)
+            elif action.action_type == FramesActions.Type.rotation:
+                # inverse of PIL's Image.rotate around the centre
+                cx, cy = size[0] / 2, size[1] / 2
+                angle = -math.radians(value)
+                cos, sin = math.cos(angle), math.sin(angle)
+                matrix = matrix @ np.array([[cos, sin, cx - cos * cx - sin * cy],
+                                            [-sin, cos, cy + sin * cx - cos * cy], [0, 0, 1]])
+            else:
+                break
+            num_geometric += 1
+        if num_geometric == 0:
+            return in_img, in_actions
+
+        # PIL coordinates are pixel corners, so sample at pixel centres
+        grid_x, grid_y = np.meshgrid(np.arange(size[0]) + 0.5, np.arange(size[1]) + 0.5)
+        src_x = matrix[0, 0] * grid_x + matrix[0, 1] * grid_y + matrix[0, 2]
+        src_y = matrix[1, 0] * grid_x + matrix[1, 1] * grid_y + matrix[1, 2]
+        tiles_y, tiles_x = layout.shape if layout is not None else (1, 1)
+        tile_x, tile_y = np.floor(src_x / w), np.floor(src_y / h)
+        inside = (tile_x >= 0) & (tile_x < tiles_x) & (tile_y >= 0) & (tile_y < tiles_y)
+        src_x -= tile_x * w
+        src_y -= tile_y * h
+        if layout is not None:
+            tile = layout[np.clip(tile_y, 0, tiles_y - 1).astype(int), np.clip(tile_x, 0, tiles_x - 1).astype(int)]
+            src_x = np.where(tile & 1, w - src_x, src_x)
+            src_y = np.where(tile & 2, h - src_y, src_y)
+        # reflecting borders match the seams between mirrored tiles
+        res = cv2.remap(np.asarray(in_img.convert('RGB')), (src_x - 0.5).astype(np.float32),
+                        (src_y - 0.5).astype(np.float32), interpolation=cv2.INTER_LINEAR,
+                        borderMode=cv2.BORDER_REFLECT)
+        res[~inside] = 0
+        return Image.fromarray(res), in_actions[num_geometric:]
+
+    @staticmethod
+    def apply_action(in_img, action_type, value, original_size):
+        if action_type == FramesActions.Type.mirror:
+            return AnimationImages.mirror_image_effect(in_img, value)
+        elif action_type == FramesActions.Type.zoom:
+            return AnimationImages.zoom_effect(in_img, value)
+        elif action_type == FramesActions.Type.crop:
+            return AnimationImages.crop_effect(in_img, value, original_size)
+        elif action_type == FramesActions.Type.rotation:
+            return AnimationImages.rotation_effect(in_img, value)
+        elif action_type == FramesActions.Type.blur:
+            return AnimationImages.blur_effect(in_img, value)
+        elif action_type == FramesActions.Type.distortion:
+            return AnimationImages.distortion_effect(in_img, value)
+        elif action_type == FramesActions.Type.brightness:
+            return AnimationImages.brightness_effect(in_img, value)
+        return in_img
+
+    @staticmethod
+    def _mirror_layout(mirror_direction):
+        """Rows of tiles for a mirror direction: 0 original, 1 flipped left-right, 2 top-bottom, 3 both."""
         if mirror_direction == FramesActions.MirrorDirection.all_directions_1:
-            new_size = (3 * w, 3 * h)
-            pos_dict = {(0, 0): 3, (1, 0): 2, (2, 0): 3,
-                        (0, 1): 1, (1, 1): 0, (2, 1): 1,
-                        (0, 2): 3, (1, 2): 2, (2, 2): 3}
+            return [[3, 2, 3],
+                    [1, 0, 1],
+                    [3, 2, 3]]
         elif mirror_direction == FramesActions.MirrorDirection.left_1:
-            new_size = (2 * w, 1 * h)
-            pos_dict = {(0, 0): 1, (1, 0): 0}
+            return [[1, 0]]
         elif mirror_direction == FramesActions.MirrorDirection.right_1:
-            new_size = (2 * w, 1 * h)
-            pos_dict = {(0, 0): 0, (1, 0): 1}
+            return [[0, 1]]
         elif mirror_direction == FramesActions.MirrorDirection.left_3:
-            new_size = (4 * w, 1 * h)
-            pos_dict = {(0, 0): 1, (1, 0): 0, (2, 0): 1, (3, 0): 0}
+            return [[1, 0, 1, 0]]
         elif mirror_direction == FramesActions.MirrorDirection.right_3:
-            new_size = (4 * w, 1 * h)
-            pos_dict = {(0, 0): 0, (1, 0): 1, (2, 0): 0, (3, 0): 1}
-        else:
+            return [[0, 1, 0, 1]]
+        return None
+
+    @staticmethod
+    def mirror_image_effect(in_img, mirror_direction):
+        layout = AnimationImages._mirror_layout(mirror_direction)
+        if layout is None:
             return in_img
-        res = Image.new('RGB', new_size)
-        [res.paste(images[idx], (w * xy[0], h * xy[1])) for xy, idx in pos_dict.items()]
+        images = [in_img, in_img.transpose(0), in_img.transpose(1),
+                  in_img.transpose(0).transpose(1)]
+        w, h = in_img.width, in_img.height
+        res = Image.new('RGB', (len(layout[0]) * w, len(layout) * h))
+        [res.paste(images[idx], (w * x, h * y)) for y, row in enumerate(layout) for x, idx in enumerate(row)]
         return res
 
     @staticmethod
@@ -650,7 +776,11 @@ class AnimationImages:
 
     @staticmethod
     def distortion_effect(in_img, distortion_strength):
-        return ImageOps.deform(in_img, AnimationImages.PincushionDeformation(distortion_strength, 1.0))
+        deformation = AnimationImages.PincushionDeformation(distortion_strength, 1.0)
+        map_x, map_y = deformation.get_remap_grids(in_img.size)
+        res = cv2.remap(np.asarray(in_img), map_x, map_y, interpolation=cv2.INTER_LINEAR,
+                        borderMode=cv2.BORDER_CONSTANT)
+        return Image.fromarray(res)
 
     @staticmethod
     def brightness_effect(in_img, brightness_value):
@@ -940,6 +1070,100 @@ def str2bool(v):
     else:
         raise argparse.ArgumentTypeError('Boolean value expected, possible values: yes, y, true, 1, no, n, false, 0.')
     
+def transition_frames(frames1, frames2, animation=ANIMATION, max_rotation=MAX_ROTATION, max_distortion=MAX_DISTORTION,
+                      max_blur=MAX_BLUR, max_brightness=MAX_BRIGHTNESS, max_zoom=MAX_ZOOM):
+    """Builds the transition in memory, without temporary videos, PNGs or ffmpeg calls.
+
+    `frames1` are the last frames of the first clip and `frames2` the first frames of the second one,
+    as RGB NumPy arrays (long translations need twice as many frames from the second clip). Returns
+    the phase1 and phase2 transition frames as RGB NumPy arrays.
+    """
+    phase1_actions, phase2_actions = _transition_actions(animation, len(frames1), max_rotation, max_distortion,
+                                                         max_blur, max_brightness, max_zoom)
+    res_frames = []
+    for frames, actions in [(frames1, phase1_actions), (frames2, phase2_actions)]:
+        images = [Image.fromarray(np.asarray(frame, dtype=np.uint8)).convert('RGB') for frame in frames]
+        res_frames.append([np.asarray(img) for img in AnimationImages.transform_images(images, actions)])
+    return res_frames[0], res_frames[1]
+
+
+def transitions_frames(frame_pairs, animations, max_workers=None, max_rotation=MAX_ROTATION,
+                       max_distortion=MAX_DISTORTION, max_blur=MAX_BLUR, max_brightness=MAX_BRIGHTNESS,
+                       max_zoom=MAX_ZOOM):
+    """Builds several transitions at once, rendering every frame of every transition in parallel.
+
+    `frame_pairs` is a list of (frames1, frames2) as taken by `transition_frames`, with one animation name
+    per pair. Frames are copied once into a shared-memory buffer that the workers of a process pool read
+    from and write their results into, so no frame is pickled. `max_workers` defaults to the core count;
+    with a single worker, or frames of different shapes, the transitions are rendered serially. Returns a
+    list of (phase1_frames, phase2_frames).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    frames = [np.asarray(frame, dtype=np.uint8) for pair in frame_pairs for phase in pair for frame in phase]
+    shapes = {frame.shape for frame in frames}
+    if max_workers == 1 or len(shapes) != 1 or len(next(iter(shapes))) != 3 or next(iter(shapes))[2] != 3:
+        return [transition_frames(frames1, frames2, animation, max_rotation, max_distortion, max_blur,
+                                  max_brightness, max_zoom)
+                for (frames1, frames2), animation in zip(frame_pairs, animations)]
+
+    # one task per frame: (actions of its phase, index of the frame within the phase)
+    tasks, phase_lengths = [], []
+    for (frames1, frames2), animation in zip(frame_pairs, animations):
+        phase_actions = _transition_actions(animation, len(frames1), max_rotation, max_distortion, max_blur,
+                                            max_brightness, max_zoom)
+        for phase_frames, actions in zip((frames1, frames2), phase_actions):
+            tasks += [(actions, img_idx) for img_idx in range(len(phase_frames))]
+            phase_lengths.append(len(phase_frames))
+
+    shape = (len(frames), *frames[0].shape)
+    nbytes = int(np.prod(shape))
+    in_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    out_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    try:
+        in_frames = np.ndarray(shape, dtype=np.uint8, buffer=in_shm.buf)
+        for frame_idx, frame in enumerate(frames):
+            in_frames[frame_idx] = frame
+        del in_frames
+
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            list(executor.map(_transform_shared_frame, [in_shm.name] * len(tasks), [out_shm.name] * len(tasks),
+                              [shape] * len(tasks), range(len(tasks)), *zip(*tasks),
+                              chunksize=max(1, len(tasks) // (max_workers * 4))))
+
+        out_frames = np.ndarray(shape, dtype=np.uint8, buffer=out_shm.buf)
+        res_phases, start = [], 0
+        for length in phase_lengths:
+            res_phases.append([out_frames[idx].copy() for idx in range(start, start + length)])
+            start += length
+        del out_frames
+    finally:
+        for shm in (in_shm, out_shm):
+            shm.close()
+            shm.unlink()
+    return list(zip(res_phases[0::2], res_phases[1::2]))
+
+
+def _transition_actions(animation, num_frames, max_rotation, max_distortion, max_blur, max_brightness, max_zoom):
+    animation_type = Animations[animation.lower().strip()]
+    actions_determinator = AnimationActions(max_zoom, max_brightness, max_rotation, max_blur,
+                                            max_distortion, num_frames)
+    return actions_determinator.get_actions_values(animation_type)
+
+
+def _transform_shared_frame(in_name, out_name, shape, frame_idx, actions, img_idx):
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        in_frames = np.ndarray(shape, dtype=np.uint8, buffer=in_shm.buf)
+        out_frames = np.ndarray(shape, dtype=np.uint8, buffer=out_shm.buf)
+        img = Image.fromarray(in_frames[frame_idx].copy())
+        out_frames[frame_idx] = np.asarray(AnimationImages.transform_image(img, actions, img_idx))
+        del in_frames, out_frames
+    finally:
+        in_shm.close()
+        out_shm.close()
+
+
 def main(input_videos=INPUT_VIDEOS, num_frames=NUM_FRAMES, animation=ANIMATION, output=OUTPUT, max_rotation=MAX_ROTATION, 
           max_distortion=MAX_DISTORTION, max_blur=MAX_BLUR, max_brightness=MAX_BRIGHTNESS, max_zoom=MAX_ZOOM, 
           debug=DEBUG, art=ART, remove=REMOVE_ORIGINAL, merge=MERGE_PHASES):
@@ -1,119 +1,262 @@
 import os
+import json
 import random
-import tempfile
+import hashlib
+import functools
+import threading
+import traceback
+import subprocess
 from typing import Callable
+from collections import OrderedDict
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import cv2
 import math
-import numpy
 import numpy as np
 from PIL import Image
 import moviepy.editor as mp
 import moviepy.video.fx.all as vfx
+from moviepy.config import get_setting
 from DepthFlow import DepthScene
 from Broken.Externals.Depthmap import DepthAnythingV2
 from DepthFlow.Motion import Presets
 
 from tools import vid_transition
 
+DEPTH_CACHE_PATH = Path('./data/cache/depth')
+# Forma parte de la clave de la caché de profundidad: cambiarlo al cambiar de estimador o de modelo
+DEPTH_ESTIMATOR_VERSION = "DepthAnythingV2-1"
+
 
 class VideoEffects:
     @staticmethod
-    def add_positional_noise(clip: mp.VideoClip, noise_level: int = 5, inertia: float = 0.9) -> mp.VideoClip:
-        last_dx = 0
-        last_dy = 0
+    def shake_trajectory(n_frames: int, noise_level: int = 5, inertia: float = 0.9, seed: int = None) -> np.ndarray:
+        """Integer (dx, dy) offset per frame: uniform random steps smoothed with inertia, drawn from `seed`."""
+        rng = np.random.default_rng(seed)
+        steps = rng.integers(-noise_level, noise_level, size=(n_frames, 2), endpoint=True)
+
+        # Aplicar inercia para suavizar el cambio de desplazamiento
+        offsets = np.empty((n_frames, 2))
+        last = np.zeros(2)
+        for i, step in enumerate(steps):
+            last = (inertia * last) + ((1 - inertia) * step)
+            offsets[i] = last
+        return np.rint(offsets).astype(int)
+
+    @staticmethod
+    def add_positional_noise(clip: mp.VideoClip, noise_level: int = 5, inertia: float = 0.9, seed: int = None) -> mp.VideoClip:
+        """Camera shake following a trajectory precomputed for the whole clip.
+
+        The offset of a frame depends only on its time, so the effect gives the same result whatever the
+        order in which frames are read (seeking, previews, several passes or parallel writers).
+        """
+        fps = clip.fps or 30
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        trajectory = VideoEffects.shake_trajectory(int(math.ceil(clip.duration * fps)) + 1, noise_level, inertia, seed)
 
         def effect(get_frame: callable, t: float) -> np.ndarray:
-            nonlocal last_dx, last_dy
             frame = get_frame(t)
             h, w = frame.shape[:2]
+            dx, dy = trajectory[min(int(round(t * fps)), len(trajectory) - 1)]
+            dx, dy = int(np.clip(dx, 1 - w, w - 1)), int(np.clip(dy, 1 - h, h - 1))
 
-            # Generar desplazamiento aleatorio para las coordenadas x e y
-            dx = random.randint(-noise_level, noise_level)
-            dy = random.randint(-noise_level, noise_level)
-
-            # Aplicar inercia para suavizar el cambio de desplazamiento
-            dx = (inertia * last_dx) + ((1 - inertia) * dx)
-            dy = (inertia * last_dy) + ((1 - inertia) * dy)
-
-            # Actualizar los últimos valores de desplazamiento
-            last_dx = dx
-            last_dy = dy
+            # Desplazamiento entero: se recorta el fotograma y se rellena el borde descubierto por reflexión
+            visible = frame[max(-dy, 0):h - max(dy, 0), max(-dx, 0):w - max(dx, 0)]
+            return cv2.copyMakeBorder(visible, max(dy, 0), max(-dy, 0), max(dx, 0), max(-dx, 0), cv2.BORDER_REFLECT)
 
-            # Crear una matriz de transformación para el desplazamiento
-            M = numpy.float32([[1, 0, dx], [0, 1, dy]])
+        return clip.fl(effect)
 
-            # Aplicar un desplazamiento afín a la imagen
-            frame_with_noise = cv2.warpAffine(frame, M, (w, h), borderMode=cv2.BORDER_REFLECT)
+    # Centro del rostro por hash de imagen: la detección se hace una sola vez por imagen fuente.
+    # Es un LRU acotado, porque el proceso del servidor renderiza series enteras sin reiniciarse
+    _face_centers: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+    FACE_CENTERS_CACHE_SIZE = 256
 
-            return frame_with_noise
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _get_face_cascade() -> cv2.CascadeClassifier:
+        return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
-        return clip.fl(effect)
+    @staticmethod
+    def _face_center(frame: np.ndarray) -> tuple[float, float]:
+        """Centre of the largest face in the frame (or of the frame if there is none), cached by image hash."""
+        image_hash = hashlib.sha256(frame.tobytes()).hexdigest()
+        face_centers = VideoEffects._face_centers
+        if image_hash in face_centers:
+            face_centers.move_to_end(image_hash)
+            return face_centers[image_hash]
+
+        # Convertir la imagen a escala de grises para la detección de rostros
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = VideoEffects._get_face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+
+        # Si se detectan rostros, centrar el zoom en el rostro más grande
+        if len(faces) > 0:
+            x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+            center = (x + w / 2, y + h / 2)
+        else:
+            center = (frame.shape[1] / 2, frame.shape[0] / 2)
+
+        face_centers[image_hash] = center
+        while len(face_centers) > VideoEffects.FACE_CENTERS_CACHE_SIZE:
+            face_centers.popitem(last=False)
+        return center
 
     @staticmethod
     def zoom_in_face_effect(clip: mp.VideoClip, zoom_ratio: float = 0.04, face_zoom: bool = True) -> mp.VideoClip:
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        """Slow zoom towards the largest face of a still image clip.
+
+        The face is detected once on the first frame; every frame is then a single crop-and-scale warp whose
+        scale and offset depend only on t.
+        """
+        first_frame = clip.get_frame(0)
+        base_height, base_width = first_frame.shape[:2]
+        if face_zoom:
+            center_x, center_y = VideoEffects._face_center(first_frame)
+        else:
+            center_x, center_y = base_width / 2, base_height / 2
 
         def effect(get_frame: Callable[[float], np.ndarray], t: float) -> np.ndarray:
             frame = get_frame(t)
-            img = Image.fromarray(frame)
-            base_size = img.size
-
-            if face_zoom:
-                # Convertir la imagen a escala de grises para la detección de rostros
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-
-                # Si se detectan rostros, centrar el zoom en el rostro más grande
-                if len(faces) > 0:
-                    faces = sorted(faces, key=lambda x: x[2] * x[3], reverse=True)  # Ordenar por tamaño de rostro
-                    x, y, w, h = faces[0]  # Tomar el rostro más grande
-                    center_x = x + w / 2
-                    center_y = y + h / 2
-                else:
-                    center_x = base_size[0] / 2
-                    center_y = base_size[1] / 2
-            else:
-                center_x = base_size[0] / 2
-                center_y = base_size[1] / 2
-
-            # Calcular el nuevo tamaño de la imagen con el efecto de zoom
-            new_width = math.ceil(base_size[0] * (1 + (zoom_ratio * t)))
-            new_height = math.ceil(base_size[1] * (1 + (zoom_ratio * t)))
+            zoom = 1 + (zoom_ratio * t)
 
-            # Asegurarse de que las nuevas dimensiones sean pares
+            # Nuevo tamaño de la imagen con el efecto de zoom, con dimensiones pares
+            new_width = math.ceil(base_width * zoom)
+            new_height = math.ceil(base_height * zoom)
             new_width += new_width % 2
             new_height += new_height % 2
 
-            # Redimensionar la imagen
-            img = img.resize((new_width, new_height), Image.LANCZOS)
-
-            # Calcular el área de recorte centrada en el rostro o en el centro
-            left = max(center_x * (1 + (zoom_ratio * t)) - base_size[0] / 2, 0)
-            top = max(center_y * (1 + (zoom_ratio * t)) - base_size[1] / 2, 0)
-            right = left + base_size[0]
-            bottom = top + base_size[1]
+            # Área de recorte centrada en el rostro o en el centro, sin salirse de la imagen ampliada
+            left = int(max(center_x * zoom - base_width / 2, 0))
+            top = int(max(center_y * zoom - base_height / 2, 0))
+            left = min(left, new_width - base_width)
+            top = min(top, new_height - base_height)
 
-            # Asegurarse de que el área de recorte no exceda las dimensiones de la imagen
-            left, top, right, bottom = [int(val) for val in [left, top, right, bottom]]
-            if right > new_width:
-                right = new_width
-                left = new_width - base_size[0]
-            if bottom > new_height:
-                bottom = new_height
-                top = new_height - base_size[1]
+            # Escalado y recorte en una sola transformación (centros de píxel como en PIL.resize)
+            scale_x, scale_y = new_width / base_width, new_height / base_height
+            M = np.float32([[scale_x, 0, 0.5 * scale_x - 0.5 - left],
+                            [0, scale_y, 0.5 * scale_y - 0.5 - top]])
+            return cv2.warpAffine(frame, M, (base_width, base_height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
 
-            # Recortar y redimensionar la imagen al tamaño base
-            img = img.crop((left, top, right, bottom)).resize(base_size, Image.LANCZOS)
+        return clip.fl(effect)
 
-            # Convertir la imagen a un array y cerrarla
-            result = numpy.array(img)
-            img.close()
 
-            return result
+class FFmpegWriter:
+    """Encodes a video by streaming raw RGB frames into a single long-lived ffmpeg process.
+
+    Audio, if any, is passed as raw PCM to the same process (through a second pipe on POSIX, a temporary
+    raw file elsewhere), so there is no separate audio encode and mux. `profile` picks the defaults for
+    preset, CRF, tune and threads; any of them can be overridden. "default" matches the baseline encoder
+    settings, "publish" trades encoding time for quality and "preview" the opposite.
+    """
+    PROFILES = {
+        "default": dict(preset="medium", crf=23, tune=None, threads=None, audio_bitrate="128k"),
+        "preview": dict(preset="ultrafast", crf=30, tune="fastdecode", threads=None, audio_bitrate="96k"),
+        "publish": dict(preset="slow", crf=18, tune=None, threads=None, audio_bitrate="192k"),
+        # Sin pérdidas y rápido: para segmentos que se vuelven a codificar al final
+        "intermediate": dict(preset="ultrafast", crf=0, tune=None, threads=None, audio_bitrate="192k"),
+    }
+
+    def __init__(self, output_path: Path, size: tuple[int, int], fps: float, profile: str = "default", audio: np.ndarray = None, audio_fps: int = 44100, **overrides):
+        if profile not in FFmpegWriter.PROFILES:
+            raise ValueError(f"Unknown encoding profile: {profile}")
+        self.settings = {**FFmpegWriter.PROFILES[profile], **{key: value for key, value in overrides.items() if value is not None}}
+        self.output_path = Path(output_path)
+        self._audio_file = None
+        self._audio_thread = None
+
+        width, height = size
+        command = [
+            get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgb24", "-r", str(fps), "-i", "-",
+        ]
+        pass_fds, audio_fd = (), None
+        if audio is not None:
+            audio = np.ascontiguousarray(audio, dtype=np.int16).reshape(len(audio), -1)
+            command += ["-f", "s16le", "-ar", str(audio_fps), "-ac", str(audio.shape[1])]
+            if os.name == "posix":
+                audio_fd, audio_write_fd = os.pipe()
+                pass_fds = (audio_fd,)
+                command += ["-i", f"pipe:{audio_fd}"]
+            else:
+                self._audio_file = self.output_path.with_suffix('.pcm')
+                self._audio_file.write_bytes(audio.tobytes())
+                command += ["-i", str(self._audio_file)]
+            command += ["-map", "0:v", "-map", "1:a", "-c:a", "aac", "-b:a", self.settings["audio_bitrate"]]
+
+        command += ["-c:v", "libx264", "-preset", self.settings["preset"], "-crf", str(self.settings["crf"]), "-pix_fmt", "yuv420p"]
+        if self.settings["tune"]:
+            command += ["-tune", self.settings["tune"]]
+        if self.settings["threads"] is not None:
+            command += ["-threads", str(self.settings["threads"])]
+        command += ["-movflags", "+faststart", str(self.output_path)]
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=pass_fds)
+        # stderr se vacía en segundo plano: si se llenara su buffer, ffmpeg se bloquearía a mitad del encode
+        self._stderr_chunks = []
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+        if audio_fd is not None:
+            os.close(audio_fd)
+            self._audio_thread = threading.Thread(target=self._write_audio, args=(audio_write_fd, audio), daemon=True)
+            self._audio_thread.start()
 
-        return clip.fl(effect)
+    @staticmethod
+    def _write_audio(fd: int, audio: np.ndarray) -> None:
+        try:
+            with os.fdopen(fd, 'wb') as pipe:
+                pipe.write(audio.tobytes())
+        except BrokenPipeError:
+            pass  # ffmpeg terminó antes; el error se informa en close()
+
+    def _drain_stderr(self) -> None:
+        for chunk in iter(lambda: self.process.stderr.read(4096), b''):
+            self._stderr_chunks.append(chunk)
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            # ffmpeg terminó antes de tiempo: se informa con lo que escribió en stderr
+            error = self._finish()
+            raise IOError(f"ffmpeg stopped accepting frames for {self.output_path}: {error.strip()}") from None
+
+    def close(self) -> None:
+        error = self._finish()
+        if self.process.returncode != 0:
+            raise IOError(f"ffmpeg failed writing {self.output_path}: {error.strip()}")
+
+    def abort(self) -> None:
+        """Kills ffmpeg and cleans up without raising, removing the partial output."""
+        self.process.kill()
+        self._finish()
+        self.output_path.unlink(missing_ok=True)
+
+    def _finish(self) -> str:
+        # Cierra la entrada, espera a ffmpeg y al hilo de audio y devuelve lo que escribió en stderr
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass  # ffmpeg ya terminó; close() lo informa por el código de salida
+        if self._audio_thread is not None:
+            self._audio_thread.join()
+        self.process.wait()
+        self._stderr_thread.join()
+        error = b''.join(self._stderr_chunks).decode('utf-8', errors='replace')
+        if self._audio_file is not None:
+            self._audio_file.unlink(missing_ok=True)
+        return error
+
+    def __enter__(self) -> "FFmpegWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        # Con una excepción en curso no se lanza otra: así se propaga la original
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
 
 
 class VideoEditor:
@@ -131,44 +274,58 @@ class VideoEditor:
         duration = audio.duration + 0.2
         return audio, duration
 
+    TRANSITION_ANIMATIONS = ["rotation", "rotation_inv", "zoom_in", "zoom_out", "translation", "translation_inv"]
+    TRANSITION_PARAMS = dict(max_rotation=45, max_distortion=0.7, max_blur=0.2, max_brightness=1.0, max_zoom=2.0)
+
     @staticmethod
-    def generate_transition(slide1: mp.VideoClip, slide2: mp.VideoClip, num_frames: int) -> tuple[mp.VideoFileClip, mp.VideoFileClip]:
-        transitions_dir = Path('./tmp/transitions')
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False, dir=transitions_dir) as temp1, \
-             tempfile.NamedTemporaryFile(suffix=".mp4", delete=False, dir=transitions_dir) as temp2, \
-             tempfile.NamedTemporaryFile(suffix=".mp4", delete=False, dir=transitions_dir) as temp_transition:
-
-            slide1.write_videofile(str(temp1.name))
-            slide2.write_videofile(str(temp2.name))
-
-            animations = ["rotation", "rotation_inv", "zoom_in", "zoom_out", "translation", "translation_inv"]
-            vid_transition.main(
-                input_videos=[str(temp1.name), str(temp2.name)],
-                num_frames=num_frames,
-                output=str(temp_transition.name),
-                animation=random.choice(animations),
-                max_rotation=45,
-                max_distortion=0.7,
-                max_blur=0.2,
-                max_brightness=1.0,
-                max_zoom=2.0,
-                debug=False,
-                art=False,
-                remove=False,
-                merge=False
-            )
+    def _transition_boundary_frames(slide1: mp.VideoClip, slide2: mp.VideoClip, num_frames: int) -> tuple[list, list]:
+        fps = slide1.fps or 30
 
-            temp_transition_path = Path(temp_transition.name)
-            transition_clip_1 = mp.VideoFileClip(str(temp_transition_path.with_name(f"{temp_transition_path.stem}_phase1.mp4")))
-            transition_clip_2 = mp.VideoFileClip(str(temp_transition_path.with_name(f"{temp_transition_path.stem}_phase2.mp4")))
-            print(f"Transition clips: {transition_clip_1, transition_clip_2}")
+        # Los fotogramas frontera se leen directamente de los clips, sin pasar por MP4 temporales ni ffmpeg
+        frames1 = [slide1.get_frame(max(slide1.duration - (num_frames - i) / fps, 0)) for i in range(num_frames)]
+        frames2 = [slide2.get_frame(min(i / fps, slide2.duration)) for i in range(num_frames)]
+        return frames1, frames2
 
-            return transition_clip_1, transition_clip_2
+    @staticmethod
+    def generate_transitions_frames(clips: list[mp.VideoClip], num_frames: int, max_workers: int = None, params: dict = None) -> list[tuple[list, list]]:
+        """Frames of the transitions between every pair of consecutive clips, all rendered in parallel.
+
+        `max_workers` processes are used (the core count by default); 1 renders serially in this process.
+        `params` overrides entries of `TRANSITION_PARAMS`.
+        """
+        frame_pairs = [VideoEditor._transition_boundary_frames(clip1, clip2, num_frames) for clip1, clip2 in zip(clips, clips[1:])]
+        animations = [random.choice(VideoEditor.TRANSITION_ANIMATIONS) for _ in frame_pairs]
+
+        return vid_transition.transitions_frames(frame_pairs, animations, max_workers=max_workers, **{**VideoEditor.TRANSITION_PARAMS, **(params or {})})
+
+    @staticmethod
+    def generate_transitions(clips: list[mp.VideoClip], num_frames: int, max_workers: int = None, params: dict = None) -> list[tuple[mp.VideoClip, mp.VideoClip]]:
+        transitions = VideoEditor.generate_transitions_frames(clips, num_frames, max_workers=max_workers, params=params)
+
+        return [
+            (mp.ImageSequenceClip(phase1_frames, fps=clip.fps or 30), mp.ImageSequenceClip(phase2_frames, fps=clip.fps or 30))
+            for clip, (phase1_frames, phase2_frames) in zip(clips, transitions)
+        ]
 
     @staticmethod
-    def adjust_video_duration(video: mp.VideoClip) -> mp.VideoClip:
+    def write_video(video: mp.VideoClip, output_path: Path, profile: str = "default", fps: float = None, preset: str = None, crf: int = None, threads: int = None, tune: str = None) -> None:
+        """Writes a clip with its audio through `FFmpegWriter`, using the given profile and overrides."""
+        fps = fps or video.fps or 30
+        audio = None
+        if video.audio is not None:
+            # Los fragmentos mono llegan como vectores 1-D: se unen por muestras y se llevan a (n, nchannels)
+            chunks = list(video.audio.iter_chunks(fps=44100, quantize=True, nbytes=2, chunksize=44100))
+            audio = np.concatenate(chunks, axis=0).reshape(-1, video.audio.nchannels)
+
+        size = tuple(video.size)
+        with FFmpegWriter(output_path, size, fps, profile=profile, audio=audio, preset=preset, crf=crf, threads=threads, tune=tune) as writer:
+            for frame in video.iter_frames(fps=fps, dtype='uint8'):
+                writer.write_frame(frame)
+
+    @staticmethod
+    def adjust_video_duration(video: mp.VideoClip, fps: int = 30) -> mp.VideoClip:
         if video.duration >= 59:
-            return video.fx(vfx.speedx, video.duration / 59).set_fps(30)
+            return video.fx(vfx.speedx, video.duration / 59).set_fps(fps)
         return video
 
     @staticmethod
@@ -178,35 +335,46 @@ class VideoEditor:
         images_path: Path = Path('tmp/images'),
         audios_path: Path = Path('tmp/audios'),
         transitions_path: Path = Path('tmp/transitions'),
-        output_path: Path = Path('output/video.mp4')
+        output_path: Path = Path('output/video.mp4'),
+        transition_workers: int = None,
+        segmented: bool = False,
+        segment_workers: int = None,
+        profile: str = "default"
     ) -> None:
         VideoEditor._create_or_clear_transitions_folder(transitions_path)
 
         images = sorted(images_path.iterdir(), key=lambda x: int(x.stem))
 
-        timeline = []
-        for n, image in enumerate(images[:-1]):  # Excluimos la última imagen porque no tiene una imagen siguiente para la transición
-
-            image_clip_1 = mp.ImageClip(str(image)).set_fps(30)
-            audio_1, duration_1 = VideoEditor.get_audio_and_duration(n, audios_path)
-            image_clip_1 = image_clip_1.set_duration(duration_1 - transition_n_frames / fps / 2)
-            image_clip_1 = VideoEffects.zoom_in_face_effect(image_clip_1)
-
-            image_clip_2 = mp.ImageClip(str(images[n + 1])).set_fps(30)
-            audio_2, duration_2 = VideoEditor.get_audio_and_duration(n + 1, audios_path)
-            image_clip_2 = image_clip_2.set_duration(duration_2 - transition_n_frames / fps / 2)
-
-            transition_clip_1, transition_clip_2 = VideoEditor.generate_transition(image_clip_1, image_clip_2, transition_n_frames)
-            full_video_1 = mp.concatenate_videoclips([image_clip_1, transition_clip_1, transition_clip_2]).set_audio(audio_1)
+        audios, image_clips = [], []
+        for n, image in enumerate(images):
+            audio, duration = VideoEditor.get_audio_and_duration(n, audios_path)
+            image_clip = mp.ImageClip(str(image)).set_fps(30)
+            image_clip = image_clip.set_duration(duration - transition_n_frames / fps / 2)
+            image_clip = VideoEffects.zoom_in_face_effect(image_clip)
+
+            audios.append(audio)
+            image_clips.append(image_clip)
+
+        if segmented:
+            transitions = VideoEditor.generate_transitions_frames(image_clips, transition_n_frames, max_workers=transition_workers)
+            specs = [
+                {"kind": "image", "source": str(image), "duration": image_clip.duration}
+                for image, image_clip in zip(images, image_clips)
+            ]
+            # El ruido obliga a recodificar al final, así que los segmentos se codifican sin pérdidas
+            concat_path, durations = VideoEditor._render_segmented(specs, transitions, fps, transitions_path, segment_workers, profile="intermediate")
+            VideoEditor._finish_segmented(concat_path, durations, audios, output_path, noise=True, profile=profile, segments_profile="intermediate")
+            return
+
+        # Todas las transiciones se generan a la vez, repartiendo sus fotogramas entre procesos
+        transitions = VideoEditor.generate_transitions(image_clips, transition_n_frames, max_workers=transition_workers)
 
-            timeline.append(full_video_1)
+        timeline = []
+        for n, (transition_clip_1, transition_clip_2) in enumerate(transitions):
+            full_video = mp.concatenate_videoclips([image_clips[n], transition_clip_1, transition_clip_2]).set_audio(audios[n])
+            timeline.append(full_video)
 
-        image_clip_last = mp.ImageClip(str(images[n + 1])).set_fps(30)
-        audio_last, duration_last = VideoEditor.get_audio_and_duration(n + 1, audios_path)
-        image_clip_last = image_clip_2.set_duration(duration_last - transition_n_frames / fps / 2)
-        image_clip_last = VideoEffects.zoom_in_face_effect(image_clip_last)
-        image_clip_last = image_clip_last.set_audio(audio_last)
-        timeline.append(image_clip_last)
+        timeline.append(image_clips[-1].set_audio(audios[-1]))
 
         # Concatenar clips y ajustar duración
         video = mp.concatenate_videoclips(timeline)
@@ -216,7 +384,7 @@ class VideoEditor:
         video = VideoEffects.add_positional_noise(video, noise_level=100, inertia=0.995)
 
         # Escribir archivo de video
-        video.write_videofile(str(output_path))
+        VideoEditor.write_video(video, output_path, profile=profile)
 
     @staticmethod
     def generate_depth_video(
@@ -226,49 +394,77 @@ class VideoEditor:
         audios_path: Path = Path('tmp/audios'),
         background_music_path: Path = None,
         transitions_path: Path = Path('tmp/transitions'),
-        output_path: Path = Path('output/video.mp4')
+        output_path: Path = Path('output/video.mp4'),
+        transition_workers: int = None,
+        segmented: bool = False,
+        segment_workers: int = None,
+        segments_path: Path = None,
+        profile: str = "default",
+        preview: bool = False
     ) -> None:
+        """Renders the short from its scene images and audios.
+
+        With `preview`, the render follows `PREVIEW_SETTINGS` (lower resolution and framerate, no SSAA,
+        transitions without blur or distortion, "preview" encoding) to check pacing and cuts quickly; in
+        segmented mode its segments are cached apart from the final render's.
+        """
         VideoEditor._create_or_clear_transitions_folder(transitions_path)
 
         images = sorted(images_path.iterdir(), key=lambda x: int(x.stem))
 
-        timeline = []
-        for n, image_path in enumerate(images[:-1]):
+        depth_params, transition_params = dict(VideoEditor.DEPTH_EFFECT_PARAMS), None
+        if preview:
+            # La duración de las transiciones se mantiene con menos fotogramas
+            fps_ratio = VideoEditor.PREVIEW_SETTINGS["fps_ratio"]
+            transition_n_frames = max(2, round(transition_n_frames * fps_ratio))
+            fps = max(1, round(fps * fps_ratio))
+            depth_params.update(VideoEditor.PREVIEW_SETTINGS["depth_params"])
+            transition_params = VideoEditor.PREVIEW_SETTINGS["transition_params"]
+            profile = "preview"
+
+        if segmented:
+            VideoEditor._generate_depth_video_incremental(
+                images, audios_path, fps, transition_n_frames, background_music_path,
+                segments_path or output_path.parent / ("segments_preview" if preview else "segments"), output_path,
+                transition_workers, segment_workers, profile, depth_params, transition_params
+            )
+            return
+
+        # Plan de render: cada escena se renderiza una sola vez y las transiciones reutilizan esos clips
+        audios, depth_clips = [], []
+        for n, image_path in enumerate(images):
             audio, duration = VideoEditor.get_audio_and_duration(n, audios_path)
             clip_duration = duration - transition_n_frames / fps / 2
 
             # Generar video con efecto de profundidad
-            depth_video_path = VideoEditor._generate_depth_effect(str(image_path), str(transitions_path / f"{n}_depth.mp4"), duration=clip_duration)
+            depth_video_path = VideoEditor._generate_depth_effect(str(image_path), str(transitions_path / f"{n}_depth.mp4"), duration=clip_duration, fps=fps, params=depth_params)
 
-            # Crear clip de video con el efecto de profundidad
-            depth_clip = mp.VideoFileClip(depth_video_path)
+            audios.append(audio)
+            depth_clips.append(mp.VideoFileClip(depth_video_path))
 
-            # Generar transición al siguiente clip
-            next_image_path = images[n + 1]
-            next_audio, next_duration = VideoEditor.get_audio_and_duration(n + 1, audios_path)
-            next_clip_duration = next_duration - transition_n_frames / fps / 2
-            next_depth_video_path = VideoEditor._generate_depth_effect(str(next_image_path), str(transitions_path / f"{n + 1}_depth.mp4"), duration=next_clip_duration)
-            next_depth_clip = mp.VideoFileClip(next_depth_video_path)
+        # Todas las transiciones se generan a la vez, repartiendo sus fotogramas entre procesos
+        transitions = VideoEditor.generate_transitions(depth_clips, transition_n_frames, max_workers=transition_workers, params=transition_params)
 
-            transition_clip_1, transition_clip_2 = VideoEditor.generate_transition(depth_clip, next_depth_clip, transition_n_frames)
-
-            full_video = mp.concatenate_videoclips([depth_clip, transition_clip_1, transition_clip_2]).set_audio(audio)
+        timeline = []
+        for n, (transition_clip_1, transition_clip_2) in enumerate(transitions):
+            full_video = mp.concatenate_videoclips([depth_clips[n], transition_clip_1, transition_clip_2]).set_audio(audios[n])
 
             timeline.append(full_video)
 
         # Procesar la última imagen
-        last_audio, last_duration = VideoEditor.get_audio_and_duration(len(images) - 1, audios_path)
-        last_clip_duration = last_duration - transition_n_frames / fps / 2
-        last_depth_video_path = VideoEditor._generate_depth_effect(str(images[-1]), str(transitions_path / f"{len(images) - 1}_depth.mp4"), duration=last_clip_duration, fps=fps)
-        last_depth_clip = mp.VideoFileClip(last_depth_video_path)
-        last_depth_clip = last_depth_clip.set_audio(last_audio)
-        timeline.append(last_depth_clip)
+        timeline.append(depth_clips[-1].set_audio(audios[-1]))
 
         # Concatenar clips y ajustar duración
         video = mp.concatenate_videoclips(timeline)
-        video = VideoEditor.adjust_video_duration(video)
+        video = VideoEditor.adjust_video_duration(video, fps=fps)
         video = video.set_audio(video.audio.volumex(1.995))  # Aproximadamente +6dB
+        video = VideoEditor._mix_background_music(video, background_music_path)
+
+        # Escribir archivo de video
+        VideoEditor.write_video(video, output_path, profile=profile)
 
+    @staticmethod
+    def _mix_background_music(video: mp.VideoClip, background_music_path: Path = None) -> mp.VideoClip:
         if background_music_path:
             background_music = mp.AudioFileClip(str(background_music_path))
             background_music_duration = background_music.duration
@@ -298,40 +494,251 @@ class VideoEditor:
             # Mezclar el audio original con la música de fondo
             final_audio = mp.CompositeAudioClip([video.audio, full_bg_music])
             video = video.set_audio(final_audio)
+        return video
 
-        # Escribir archivo de video
-        video.write_videofile(str(output_path))
+    @staticmethod
+    def _render_segmented(specs: list[dict], transitions: list[tuple[list, list]], fps: int, segments_path: Path, max_workers: int = None, retries: int = 2, profile: str = "default") -> tuple[Path, list[float]]:
+        """Encodes every scene segment (clip plus its outgoing transition) in its own process and joins them.
+
+        Segments are encoded without audio and with the same `profile`, so they can be concatenated with a
+        stream copy; a failed segment is retried on its own up to `retries` times. Specs marked `"dirty": False` reuse their existing file.
+        `transitions[n]` holds the frames of segment n's transition (None when it has none or is clean).
+        Returns the path of the concatenated video and the duration of each segment.
+        """
+        for n, spec in enumerate(specs):
+            spec.update(fps=fps, profile=profile, output=str(segments_path / f"{n}_segment.mp4"), transition=None)
+            if n < len(transitions) and transitions[n] is not None:
+                phase1_frames, phase2_frames = transitions[n]
+                spec["transition"] = str(segments_path / f"{n}_transition.npz")
+                np.savez(spec["transition"], phase1=np.stack(phase1_frames), phase2=np.stack(phase2_frames))
+
+        pending = [spec for spec in specs if spec.get("dirty", True)]
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+            for attempt in range(retries + 1):
+                futures = {executor.submit(_render_segment, spec): spec for spec in pending}
+                pending = []
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception:
+                        if attempt == retries:
+                            raise
+                        traceback.print_exc()
+                        pending.append(futures[future])
+                if not pending:
+                    break
+        for spec in specs:
+            if spec["transition"]:
+                Path(spec["transition"]).unlink(missing_ok=True)
+
+        concat_path = segments_path / "segments.mp4"
+        concat_list = segments_path / "segments.txt"
+        concat_list.write_text(
+            "".join(f"file '{Path(spec['output']).resolve().as_posix()}'\n" for spec in specs), encoding='utf-8'
+        )
+        VideoEditor._run_ffmpeg(["-f", "concat", "-safe", "0", "-i", str(concat_list), "-c", "copy", str(concat_path)])
+
+        durations = []
+        for spec in specs:
+            segment = mp.VideoFileClip(spec["output"])
+            durations.append(segment.duration)
+            segment.close()
+        return concat_path, durations
 
     @staticmethod
-    def _generate_depth_effect(input_image_path, output_video_path, duration=5, fps=30):
-        scene = DepthScene(backend="headless")
+    def _hash_inputs(*inputs) -> str:
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+    @staticmethod
+    def _generate_depth_video_incremental(
+        images: list[Path],
+        audios_path: Path,
+        fps: int,
+        transition_n_frames: int,
+        background_music_path: Path,
+        segments_path: Path,
+        output_path: Path,
+        transition_workers: int = None,
+        segment_workers: int = None,
+        profile: str = "default",
+        depth_params: dict = None,
+        transition_params: dict = None
+    ) -> None:
+        """Segmented depth render that only rebuilds what changed since the previous render.
+
+        `segments_path/manifest.json` records the input hash of every scene (image, audio, fps, depth effect
+        parameters) and of every segment (its scene, the next scene, whose first frames its transition uses,
+        and the transition seed). Depth clips and segments whose hashes match are reused as they are, so
+        replacing one image re-renders that scene and the transition leading into it.
+        """
+        depth_params = depth_params or VideoEditor.DEPTH_EFFECT_PARAMS
+        transition_params = {**VideoEditor.TRANSITION_PARAMS, **(transition_params or {})}
+        segments_path.mkdir(parents=True, exist_ok=True)
+        manifest_path = segments_path / "manifest.json"
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+        old_scenes, old_segments = manifest.get("scenes", []), manifest.get("segments", [])
+
+        audios, scene_keys, depth_paths, total_duration = [], [], [], 0.0
+        for n, image_path in enumerate(images):
+            audio, duration = VideoEditor.get_audio_and_duration(n, audios_path)
+            total_duration += duration
+            clip_duration = duration - transition_n_frames / fps / 2
+            scene_key = VideoEditor._hash_inputs(
+                VideoEditor._file_hash(image_path), VideoEditor._file_hash(audios_path / f"{n}.mp3"),
+                fps, clip_duration, depth_params
+            )
+
+            depth_video_path = segments_path / f"{n}_depth.mp4"
+            if n >= len(old_scenes) or old_scenes[n] != scene_key or not depth_video_path.exists():
+                depth_video_path = Path(VideoEditor._generate_depth_effect(str(image_path), str(depth_video_path), duration=clip_duration, fps=fps, params=depth_params))
+
+            audios.append(audio)
+            scene_keys.append(scene_key)
+            depth_paths.append(depth_video_path)
+
+        # Si el vídeo se va a acelerar se recodifica al final, así que los segmentos se codifican sin pérdidas
+        segments_profile = "intermediate" if total_duration >= 59 else profile
 
-        estimator = DepthAnythingV2()
-        scene.set_estimator(estimator)
+        specs, segments = [], []
+        for n, depth_video_path in enumerate(depth_paths):
+            old_segment = old_segments[n] if n < len(old_segments) else {}
+            seed = old_segment.get("seed", random.randrange(2 ** 32))
+            next_scene_key = scene_keys[n + 1] if n + 1 < len(scene_keys) else None
+            key = VideoEditor._hash_inputs(scene_keys[n], next_scene_key, seed, transition_n_frames, transition_params, FFmpegWriter.PROFILES[segments_profile])
+
+            dirty = old_segment.get("key") != key or not (segments_path / f"{n}_segment.mp4").exists()
+            specs.append({"kind": "video", "source": str(depth_video_path), "dirty": dirty})
+            segments.append({"key": key, "seed": seed})
+
+        # Solo se generan las transiciones de los segmentos que cambian
+        transition_indices = [n for n, spec in enumerate(specs) if spec["dirty"] and n + 1 < len(specs)]
+        clips = {n: mp.VideoFileClip(str(depth_paths[n])) for n in {i + j for i in transition_indices for j in (0, 1)}}
+        frame_pairs = [VideoEditor._transition_boundary_frames(clips[n], clips[n + 1], transition_n_frames) for n in transition_indices]
+        animations = [random.Random(segments[n]["seed"]).choice(VideoEditor.TRANSITION_ANIMATIONS) for n in transition_indices]
+        rendered = vid_transition.transitions_frames(frame_pairs, animations, max_workers=transition_workers, **transition_params)
+        for clip in clips.values():
+            clip.close()
+
+        transitions = [None] * len(specs)
+        for n, frames in zip(transition_indices, rendered):
+            transitions[n] = frames
+
+        concat_path, durations = VideoEditor._render_segmented(specs, transitions, fps, segments_path, segment_workers, profile=segments_profile)
+
+        tmp_manifest_path = manifest_path.with_suffix('.tmp')
+        tmp_manifest_path.write_text(json.dumps({"scenes": scene_keys, "segments": segments}, indent=4), encoding='utf-8')
+        tmp_manifest_path.replace(manifest_path)
+
+        VideoEditor._finish_segmented(concat_path, durations, audios, output_path, volume=1.995, background_music_path=background_music_path, profile=profile, segments_profile=segments_profile)
+
+    @staticmethod
+    def _finish_segmented(concat_path: Path, durations: list[float], audios: list[mp.AudioClip], output_path: Path, volume: float = 1.0, background_music_path: Path = None, noise: bool = False, profile: str = "default", segments_profile: str = None) -> None:
+        """Applies the global post-effects to the concatenated segments, re-encoding the video only when needed.
+
+        The video is encoded once with `profile` when it is sped up, gets noise or its segments were encoded
+        with another `segments_profile`; otherwise the segments' video stream is copied as it is.
+        """
+        video = mp.VideoFileClip(str(concat_path))
+
+        # Cada audio empieza donde empieza su segmento
+        starts = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+        video = video.set_audio(mp.CompositeAudioClip([audio.set_start(t) for audio, t in zip(audios, starts)]).set_duration(video.duration))
+
+        sped_up = video.duration >= 59
+        video = VideoEditor.adjust_video_duration(video, fps=video.fps)
+        if volume != 1.0:
+            video = video.set_audio(video.audio.volumex(volume))
+        video = VideoEditor._mix_background_music(video, background_music_path)
+
+        if noise:
+            video = VideoEffects.add_positional_noise(video, noise_level=100, inertia=0.995)
+
+        if sped_up or noise or (segments_profile or profile) != profile:
+            VideoEditor.write_video(video, output_path, profile=profile)
+        else:
+            # El vídeo no cambia: solo se codifica el audio y se multiplexa copiando el flujo de vídeo
+            audio_path = concat_path.with_suffix('.m4a')
+            try:
+                video.audio.write_audiofile(str(audio_path), fps=44100, codec='aac', logger=None)
+                VideoEditor._run_ffmpeg(["-i", str(concat_path), "-i", str(audio_path), "-map", "0:v", "-map", "1:a", "-c", "copy", str(output_path)])
+            finally:
+                audio_path.unlink(missing_ok=True)
+        video.close()
+
+    @staticmethod
+    def _run_ffmpeg(args: list[str]) -> None:
+        subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", *args], check=True)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _get_depth_estimator() -> DepthAnythingV2:
+        # El modelo de profundidad se carga una sola vez por proceso
+        return DepthAnythingV2()
+
+    @staticmethod
+    def _estimate_depth(input_image_path, image: Image.Image, cache_path: Path = DEPTH_CACHE_PATH) -> np.ndarray:
+        """Returns the depth map of an image, reusing a float16 copy cached by image content and estimator version."""
+        image_hash = hashlib.sha256(Path(input_image_path).read_bytes()).hexdigest()
+        cache_key = hashlib.sha256(f"{DEPTH_ESTIMATOR_VERSION}:{image_hash}".encode('utf-8')).hexdigest()
+        depth_file = cache_path / f"{cache_key}.npy"
+
+        if depth_file.exists():
+            return np.load(depth_file, mmap_mode='r').astype(np.float32)
+
+        # El modelo solo se carga si hay que estimar
+        depth = np.asarray(VideoEditor._get_depth_estimator().estimate(image), dtype=np.float32)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        tmp_file = depth_file.with_suffix('.tmp.npy')
+        depth = depth.astype(np.float16)
+        np.save(tmp_file, depth)
+        tmp_file.replace(depth_file)
+        # Se devuelve la misma precisión que en un acierto de caché, para que el render no dependa de ello
+        return depth.astype(np.float32)
+
+    # Parámetros del efecto de profundidad; forman parte de la clave de cada escena en el manifiesto de segmentos
+    DEPTH_EFFECT_PARAMS = dict(intensity=1, depth=0.5, ssaa=1.5, scale=1.0)
+
+    # Previsualización: mitad de resolución y fps, sin SSAA, y transiciones sin desenfoque ni distorsión
+    PREVIEW_SETTINGS = dict(
+        fps_ratio=0.5,
+        depth_params=dict(scale=0.5, ssaa=1.0),
+        transition_params=dict(max_blur=0, max_distortion=0),
+    )
+
+    @staticmethod
+    def _generate_depth_effect(input_image_path, output_video_path, duration=5, fps=30, params: dict = None):
+        params = params or VideoEditor.DEPTH_EFFECT_PARAMS
+        # La escena recibe el mapa de profundidad ya calculado, así que no necesita estimador propio
+        scene = DepthScene(backend="headless")
 
         image = Image.open(input_image_path)
-        depth = estimator.estimate(image)
+        depth = VideoEditor._estimate_depth(input_image_path, image)
 
-        width, height = image.size
+        # Dimensiones pares para poder codificar en yuv420p
+        width, height = [max(2, round(size * params["scale"] / 2) * 2) for size in image.size]
 
         scene.input(image=image, depth=depth)
         scene.aspect_ratio = None
 
         scene.add_animation(
             Presets.Dolly(
-                intensity=1,
+                intensity=params["intensity"],
                 reverse=False,
                 cumulative=False,
                 smooth=False,
                 loop=False,
-                depth=0.5,
+                depth=params["depth"],
             )
         )
 
         output_path = scene.main(
             width=width,
             height=height,
-            ssaa=1.5,
+            ssaa=params["ssaa"],
             fps=fps,
             time=duration,
             loop=0,
@@ -342,6 +749,31 @@ class VideoEditor:
         return str(output_path)
 
 
+def _render_segment(spec: dict) -> str:
+    """Process pool worker: encodes one segment described by `VideoEditor._render_segmented`."""
+    fps = spec["fps"]
+    if spec["kind"] == "image":
+        clip = mp.ImageClip(spec["source"]).set_fps(fps).set_duration(spec["duration"])
+        clip = VideoEffects.zoom_in_face_effect(clip)
+    else:
+        clip = mp.VideoFileClip(spec["source"])
+
+    clips = [clip]
+    if spec["transition"]:
+        with np.load(spec["transition"]) as transition:
+            clips += [mp.ImageSequenceClip(list(transition["phase1"]), fps=fps), mp.ImageSequenceClip(list(transition["phase2"]), fps=fps)]
+
+    segment = mp.concatenate_videoclips(clips)
+    output_path = Path(spec["output"])
+    tmp_path = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
+    with FFmpegWriter(tmp_path, tuple(segment.size), fps, profile=spec["profile"]) as writer:
+        for frame in segment.iter_frames(fps=fps, dtype='uint8'):
+            writer.write_frame(frame)
+    tmp_path.replace(output_path)
+    clip.close()
+    return str(output_path)
+
+
 if __name__ == "__main__":
     N = 1
     ASSETS_FOLDER = Path('data/MITO_TV/SHORTS/MITOS_NORDICOS/')
@@ -3,8 +3,9 @@ if os.path.abspath(os.path.join(os.path.dirname(__file__), '..')) not in sys.pat
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import statistics
-from typing import Dict
 from pathlib import Path
+from typing import Dict, Literal
+from concurrent.futures import ThreadPoolExecutor
 
 from prompts import WriterPrompts
 from generators.LLM import LLM, LLMResponse
@@ -61,23 +62,53 @@ class Writer():
         text = text.replace('"', "'")
         return text
     
-    def evaluate_text(self, text: str) -> Dict[str, any]:
+    EVALUATION_CRITERIA = {
+        "historical_accuracy": WriterPrompts.Evaluation.evaluate_historical_accuracy,
+        "storytelling_quality": WriterPrompts.Evaluation.evaluate_storytelling,
+        "emotional_impact": WriterPrompts.Evaluation.evaluate_emotional_impact,
+    }
+
+    def evaluate_text(self, text: str, mode: Literal["sequential", "parallel", "batched"] = "parallel") -> Dict[str, any]:
+        if mode == "batched":
+            criteria_scores, cost = self._evaluate_batched(text)
+        elif mode == "parallel":
+            with ThreadPoolExecutor(max_workers=len(self.EVALUATION_CRITERIA)) as executor:
+                results = list(executor.map(
+                    lambda prompt: self._evaluate_aspect(text, prompt(), lambda x: float(x.strip())),
+                    self.EVALUATION_CRITERIA.values()
+                ))
+            criteria_scores = dict(zip(self.EVALUATION_CRITERIA, [score for score, _ in results]))
+            cost = sum(aspect_cost for _, aspect_cost in results)
+        elif mode == "sequential":
+            criteria_scores, cost = {}, 0
+            for criterion, prompt in self.EVALUATION_CRITERIA.items():
+                criteria_scores[criterion], aspect_cost = self._evaluate_aspect(text, prompt(), lambda x: float(x.strip()))
+                cost += aspect_cost
+        else:
+            raise ValueError(f"Unsupported evaluation mode: {mode}")
+
         scores = {
-            "historical_accuracy": self._evaluate_aspect(text, WriterPrompts.Evaluation.evaluate_historical_accuracy(), lambda x: float(x.strip())),
-            "storytelling_quality": self._evaluate_aspect(text, WriterPrompts.Evaluation.evaluate_storytelling(), lambda x: float(x.strip())),
-            "emotional_impact": self._evaluate_aspect(text, WriterPrompts.Evaluation.evaluate_emotional_impact(), lambda x: float(x.strip())),
-            "average_score": None,
-            "word_count": len(text.split())
+            **criteria_scores,
+            "average_score": statistics.mean(criteria_scores.values()),
+            "word_count": len(text.split()),
+            "cost": cost
         }
-        scores["average_score"] = statistics.mean([v for k,v in scores.items() if k not in ["average_score", "word_count"]])
         return scores
 
-    def _evaluate_aspect(self, text: str, prompt: str, parse_function: callable) -> any:
+    def _evaluate_aspect(self, text: str, prompt: str, parse_function: callable) -> tuple[any, float]:
         result: LLMResponse = self.llm.generate_text(
             system_prompt=prompt,
             prompt=f"Evalúa el siguiente texto:\n\n{text}",
         )
-        return parse_function(result.text)
+        return parse_function(result.text), result.cost
+
+    def _evaluate_batched(self, text: str) -> tuple[Dict[str, float], float]:
+        result: LLMResponse = self.llm.generate_text(
+            system_prompt=WriterPrompts.Evaluation.evaluate_all(),
+            prompt=f"Evalúa el siguiente texto:\n\n{text}",
+        )
+        criteria_scores = {criterion: float(result.extract_tag(criterion)) for criterion in self.EVALUATION_CRITERIA}
+        return criteria_scores, result.cost
 
 if __name__ == "__main__":
     from generators.LLM import Models